@@ -0,0 +1,217 @@
+"""
+Compare recipes.get_recipe and BaseCrawler.get_recipe with the
+find() based versions they replaced, for results and speed. Only
+the microdata path of recipes.get_recipe is compared, the legacy
+version never read JSON-LD.
+
+Pages in a benchmarks/corpus/<Name> directory go through that
+site's crawler, and the legacy version gets the site's old
+fix_soup applied first (outside the timing).
+
+    python benchmarks/extract.py page.html [page.html ...]
+"""
+import os
+import re
+import sys
+import logging
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bs4 import BeautifulSoup
+from isodate import ISO8601Error
+
+from recipe_scrapers import log
+from recipe_scrapers import recipes
+from recipe_scrapers.crawlers import BaseCrawler, get_crawlers
+
+
+FIELDS = ('url', 'name', 'image', 'author', 'recipe_yield',
+          'recipe_category', 'recipe_cuisine', 'cook_time',
+          'prep_time', 'total_time', 'ingredients')
+
+
+def legacy_get_recipe(soup, url):
+    bigsoup = soup
+    soup = bigsoup.find(itemtype='http://schema.org/Recipe')
+    if not soup:
+        raise recipes.NoRecipeException(url)
+    recipe = recipes.Recipe()
+    recipe.url = url
+    recipe.name = soup.find(itemprop='name').text
+    img = soup.find(itemprop='image')
+    for tag in ('src', 'srcset', 'content', 'href'):
+        if tag in img.attrs:
+            recipe.image = img.get(tag)
+            break
+    attrs = [(soup, {'itemprop': 'author'}),
+             (bigsoup, {'property': re.compile('^(.*)author$')}),
+             (bigsoup, {'property': re.compile('^(.*)site_name$')})]
+    for s, a in attrs:
+        auth = s.find(attrs=a)
+        if auth:
+            author = auth.text
+            if not author:
+                author = auth.get('content')
+                if not author:
+                    continue
+            recipe.author = author
+            break
+    if not recipe.author:
+        raise Exception(url)
+    for attr, prop in (('recipe_yield', 'recipeYield'),
+                       ('recipe_category', 'recipeCategory'),
+                       ('recipe_cuisine', 'recipeCuisine')):
+        tags = soup.find_all(attrs={'itemprop': prop})
+        if tags:
+            setattr(recipe, attr, tags[0].text)
+    for prop, attr in (('cookTime', 'cook_time'),
+                       ('prepTime', 'prep_time'),
+                       ('totalTime', 'total_time')):
+        t = soup.find(attrs={'itemprop': prop})
+        if not t:
+            continue
+        thetime = t.get('datetime', t.get('content'))
+        if not thetime:
+            thetime = t.find(class_='value-title').get('title')
+        try:
+            setattr(recipe, attr, thetime)
+        except ISO8601Error:
+            pass
+    for ingtag in soup.find_all(attrs={'itemprop': 'ingredients'}):
+        recipe.ingredients.append(ingtag.text)
+    return recipe
+
+
+def legacy_crawler_get_recipe(soup):
+    # With the itemprprop='ingredients' typo fixed, otherwise
+    # the old version never found any ingredients.
+    recipe = recipes.Recipe()
+    recipe.url = soup.url
+    rsoup = soup.find(itemtype='http://schema.org/Recipe')
+    recipe.name = rsoup.find(itemprop='name').text
+    recipe.author = rsoup.find(itemprop='author').text
+    recipe.image = rsoup.find(itemprop='image')['src']
+    recipe.ingredients = [i.text for i in rsoup.find_all(
+        itemprop='ingredients')]
+    for attr, prop in (('recipe_yield', 'recipeYield'),
+                       ('recipe_category', 'recipeCategory'),
+                       ('recipe_cuisine', 'recipeCuisine')):
+        t = rsoup.find(itemprop=prop)
+        if t:
+            setattr(recipe, attr, t.text)
+    for prop, attr in (('cookTime', 'cook_time'),
+                       ('prepTime', 'prep_time'),
+                       ('totalTime', 'total_time')):
+        t = rsoup.find(itemprop=prop)
+        if t:
+            try:
+                setattr(recipe, attr, t['datetime'])
+            except ISO8601Error:
+                pass
+    return recipe
+
+
+def legacy_cookieandkate_fix_soup(soup):
+    rsoup = soup.find(itemtype='http://schema.org/Recipe')
+    img = rsoup.find(itemprop='image')
+    img['src'] = img['href']
+    if not rsoup.find(itemprop='author'):
+        author = soup.new_tag('div', itemprop='author')
+        author.string = 'Cookie and Kate'
+        rsoup.insert(3, author)
+
+
+def legacy_foodheavenmadeeasy_fix_soup(soup):
+    img = soup.find(class_=re.compile(r'wp-image-\w+'))
+    img['itemprop'] = 'image'
+    soup.find(itemtype='http://schema.org/Recipe').append(img)
+
+
+def legacy_skinnytaste_fix_soup(soup):
+    rsoup = soup.find(itemtype='http://schema.org/Recipe')
+    if rsoup.find(itemprop='author'):
+        return
+    author = soup.new_tag('div', itemprop='author')
+    author.string = 'Skinnytaste'
+    rsoup.insert(3, author)
+    for attr in ('totalTime', 'cookTime', 'prepTime'):
+        tag = rsoup.find(itemprop=attr)
+        if tag:
+            tag['datetime'] = tag['content']
+
+
+# The fix_soup overrides replaced by the declarative site fixups
+LEGACY_FIX_SOUP = {
+    'CookieAndKate': legacy_cookieandkate_fix_soup,
+    'FoodHeavenMadeEasy': legacy_foodheavenmadeeasy_fix_soup,
+    'SkinnyTaste': legacy_skinnytaste_fix_soup,
+}
+
+
+def site_of(path):
+    """
+    The crawler name of a page in benchmarks/corpus, or None.
+    """
+    name = os.path.basename(os.path.dirname(os.path.abspath(path)))
+    return name if name in get_crawlers() else None
+
+
+def make_soup(path):
+    with open(path) as f:
+        soup = BeautifulSoup(f.read(), 'lxml')
+    soup.url = path
+    return soup
+
+
+def result(func, *args):
+    try:
+        recipe = func(*args)
+    except Exception as e:
+        return type(e).__name__
+    return tuple(getattr(recipe, f) for f in FIELDS)
+
+
+def bench(func, args, number):
+    return min(timeit.repeat(lambda: result(func, *args),
+                             number=number, repeat=3)) / number
+
+
+def main(paths, number=20):
+    log.setLevel(logging.CRITICAL)
+
+    def microdata_get_recipe(soup, url):
+        return recipes.get_recipe(soup, url, json_ld=False)
+
+    totals = {'recipes.get_recipe': [0.0, 0.0],
+              'BaseCrawler.get_recipe': [0.0, 0.0]}
+    mismatches = 0
+    for path in paths:
+        site = site_of(path)
+        klass = get_crawlers()[site] if site else BaseCrawler
+        crawler = klass.__new__(klass)
+        soup = make_soup(path)
+        legacy_soup = soup
+        if site in LEGACY_FIX_SOUP:
+            legacy_soup = make_soup(path)
+            LEGACY_FIX_SOUP[site](legacy_soup)
+        pairs = (('recipes.get_recipe',
+                  legacy_get_recipe, (soup, path),
+                  microdata_get_recipe, (soup, path)),
+                 ('BaseCrawler.get_recipe',
+                  legacy_crawler_get_recipe, (legacy_soup, ),
+                  crawler.get_recipe, (soup, )))
+        for name, old, old_args, new, new_args in pairs:
+            if result(old, *old_args) != result(new, *new_args):
+                mismatches += 1
+                print 'MISMATCH {} {}'.format(name, path)
+            totals[name][0] += bench(old, old_args, number)
+            totals[name][1] += bench(new, new_args, number)
+    for name, (old, new) in sorted(totals.items()):
+        print '{:<24} old {:8.2f}ms  new {:8.2f}ms  x{:.2f}'.format(
+            name, old * 1000, new * 1000, old / new if new else 0)
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,325 @@
+"""
+Write the checked-in benchmark corpus: for every crawler an index
+page and a few recipe pages in benchmarks/corpus, in the layout
+record.py writes. The pages are generated, not recorded. They copy
+each site's markup where the crawler looks (link containers, recipe
+microdata, JSON-LD and the site fixups) and pad it with
+WordPress-like navigation, posts, sidebars, comments and scripts. Generation is
+seeded, so the corpus is the same on every run and run.py
+--compare measures code changes, not changes to the sites.
+
+    python benchmarks/make_corpus.py [--recipes N]
+"""
+import os
+import sys
+import json
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from recipe_scrapers.crawlers import get_crawlers
+
+
+CORPUS = os.path.join(os.path.dirname(__file__), 'corpus')
+
+# How each site marks up its index links and recipes.
+# links: tag and class around every recipe link on an index page,
+# author: has an author itemprop, image: 'img' (itemprop src),
+# 'a' (itemprop href) or 'fallback' (wp-image class outside the
+# recipe), time: attribute holding the durations, json_ld: the
+# recipe is also in a Yoast style JSON-LD @graph in the head.
+SITES = {
+    'MinimalistBaker': dict(links=('div', 'entry-content'), author=True,
+                            image='img', time='datetime', json_ld=True),
+    'CookieAndKate': dict(links=('div', 'lcp_catlist_item'), author=False,
+                          image='a', time='datetime'),
+    'NaturallyElla': dict(links=('div', 'fm_recipe'), author=True,
+                          image='img', time='datetime'),
+    'LexisCleanKitchen': dict(links=('h2', 'post_title'), author=True,
+                              image='img', time='datetime'),
+    'SweetPotatoSoul': dict(links=('div', 'recipe'), author=True,
+                            image='img', time='datetime'),
+    'SeasonsAndSupper': dict(links=('ul', 'lcp_catlist'), author=True,
+                             image='img', time='datetime'),
+    'FoodHeavenMadeEasy': dict(links=('li', 'cat-list'), author=True,
+                               image='fallback', time='datetime'),
+    'SkinnyTaste': dict(links=('div', 'archive-post'), author=False,
+                        image='img', time='content', json_ld=True),
+    'DamnDelicious': dict(links=('div', 'archive-post'), author=True,
+                          image='img', time='datetime', json_ld=True),
+}
+
+WORDS = (
+    'quick easy creamy roasted vegan gluten free healthy crispy spicy '
+    'sweet savory weeknight simple cozy fresh bright hearty one pot '
+    'baked grilled sauteed whisk stir simmer toss drizzle fold season '
+    'bowl skillet oven sheet pan blender lemon garlic ginger basil '
+    'cilantro tomato chickpea lentil quinoa sweet potato kale spinach '
+    'mushroom coconut almond oat maple chocolate cinnamon turmeric '
+    'cumin paprika avocado black bean rice noodle tofu pumpkin apple '
+    'the a and with for to of in on it this is so my you our really '
+    'love make perfect favorite recipe minutes flavor texture').split()
+
+INGREDIENTS = (
+    'olive oil', 'garlic, minced', 'yellow onion, diced', 'sea salt',
+    'black pepper', 'canned chickpeas, rinsed', 'coconut milk',
+    'fresh spinach', 'sweet potatoes, cubed', 'red lentils',
+    'quinoa, rinsed', 'vegetable broth', 'lemon juice', 'maple syrup',
+    'rolled oats', 'almond butter', u'cr\xe8me fra\xeeche', 'tomato paste',
+    'ground cumin', 'smoked paprika', 'fresh basil', 'cilantro',
+    'brown rice', 'firm tofu, pressed', 'cherry tomatoes, halved')
+
+AMOUNTS = (u'1', u'2', u'1/2', u'\xbd', u'3/4', u'1 1/2', u'2-3', u'4')
+UNITS = (u'cup', u'cups', u'Tbsp', u'tsp', u'ounces', u'cloves', u'')
+
+
+def sentence(rng, n):
+    words = [rng.choice(WORDS) for _ in range(n)]
+    return ' '.join(words).capitalize() + '.'
+
+
+def paragraph(rng):
+    return ' '.join(sentence(rng, rng.randint(8, 18))
+                    for _ in range(rng.randint(3, 6)))
+
+
+def title(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(4)).title()
+
+
+def head(rng, site, page_title, json_ld=u''):
+    styles = ''.join(
+        '<link rel="stylesheet" id="style-{0}-css" href="{1}/wp-content/'
+        'plugins/plugin-{0}/style.css?ver=4.{0}" type="text/css" '
+        'media="all" />\n'.format(i, site['root']) for i in range(12))
+    settings = json.dumps(dict(
+        ('option_{}'.format(i), sentence(rng, 6)) for i in range(40)))
+    return (
+        u'<!DOCTYPE html>\n<html lang="en-US"><head>\n'
+        u'<meta charset="UTF-8" />\n<title>{title} | {name}</title>\n'
+        u'<meta name="viewport" content="width=device-width" />\n'
+        u'<meta property="og:site_name" content="{name}" />\n'
+        u'<meta property="og:title" content="{title}" />\n'
+        u'<meta property="article:author" '
+        u'content="https://www.facebook.com/{name}" />\n'
+        u'{styles}<script type="text/javascript">'
+        u'var siteSettings = {settings};</script>\n{json_ld}</head>\n'
+        ).format(title=page_title, name=site['name'], styles=styles,
+                 settings=settings, json_ld=json_ld)
+
+
+def header(rng, site):
+    menu = ''.join(
+        '<li class="menu-item menu-item-{0}"><a href="{1}/category/'
+        '{2}/">{3}</a></li>\n'.format(
+            i, site['root'], rng.choice(WORDS), title(rng))
+        for i in range(60))
+    return (u'<body class="post-template-default single">\n'
+            u'<header class="site-header"><nav class="nav-primary">'
+            u'<ul class="menu">\n{}</ul></nav></header>\n').format(menu)
+
+
+def sidebar(rng, site):
+    posts = ''.join(
+        '<li><a href="{}/{}-{}/"><img src="{}/wp-content/uploads/'
+        'thumb-{}.jpg" width="80" height="80" />{}</a></li>\n'.format(
+            site['root'], rng.choice(WORDS), i, site['root'], i,
+            title(rng))
+        for i in range(25))
+    return (u'<aside class="sidebar"><section class="widget">'
+            u'<h4>Popular</h4><ul>\n{}</ul></section>'
+            u'<section class="widget"><p>{}</p></section></aside>\n'
+            ).format(posts, paragraph(rng))
+
+
+def footer(rng, site):
+    comments = ''.join(
+        '<li class="comment" id="comment-{0}"><article>'
+        '<footer class="comment-meta"><b class="fn">{1}</b>'
+        '<time datetime="2016-0{2}-1{2}">March 1{2}, 2016</time>'
+        '</footer><div class="comment-content"><p>{3}</p></div>'
+        '<a class="comment-reply-link" href="#respond">Reply</a>'
+        '</article></li>\n'.format(
+            i, title(rng), i % 9 + 1, paragraph(rng))
+        for i in range(12))
+    tracking = ''.join(
+        '<script type="text/javascript">(function(){{var s{0}='
+        'document.createElement("script");s{0}.src="//cdn.example.com/'
+        'tag-{0}.js";document.body.appendChild(s{0});}})();</script>\n'
+        .format(i) for i in range(8))
+    return (u'<div class="comments"><ol class="comment-list">\n{}</ol>'
+            u'</div>\n<footer class="site-footer"><p>Copyright {}</p>'
+            u'</footer>\n{}</body></html>\n').format(
+                comments, site['name'], tracking)
+
+
+def link_block(site, url, text):
+    tag, cls = site['links']
+    if tag == 'ul':
+        return (u'<ul class="{}"><li><a href="{}">{}</a></li></ul>\n'
+                .format(cls, url, text))
+    if tag == 'h2':
+        return u'<h2 class="{}"><a href="{}">{}</a></h2>\n'.format(
+            cls, url, text)
+    return (u'<{0} class="{1}"><a href="{2}"><img src="{2}thumb.jpg" />'
+            u'</a><p><a href="{2}">{3}</a></p></{0}>\n').format(
+                tag, cls, url, text)
+
+
+def index_page(rng, site, url, links):
+    posts = ''.join(link_block(site, link, title(rng)) for link in links)
+    pagination = ''.join(
+        '<a class="page-numbers" href="{}">{}</a>'.format(
+            site['page_url'](n), n) for n in (2, 3, 4, 28))
+    return (head(rng, site, 'Recipes') + header(rng, site) +
+            u'<main class="content"><h1>Recipes</h1>\n{}'
+            u'<nav class="pagination">{}</nav></main>\n'.format(
+                posts, pagination) +
+            sidebar(rng, site) + footer(rng, site))
+
+
+def duration(site, prop, minutes):
+    value = 'PT{}M'.format(minutes)
+    if site['time'] == 'content':
+        return (u'<meta itemprop="{}" content="{}"><span>{} mins</span>'
+                .format(prop, value, minutes))
+    return u'<time itemprop="{}" datetime="{}">{} mins</time>'.format(
+        prop, value, minutes)
+
+
+def json_ld_script(site, url, name, image, description, times,
+                   servings, category, cuisine, ingredients, steps):
+    prep, cook = times
+    recipe = {
+        '@type': 'Recipe', '@id': url + '#recipe', 'name': name,
+        'author': {'@type': 'Person', 'name': site['name'],
+                   'url': site['root'] + '/about/'},
+        'description': description,
+        'image': [{'@type': 'ImageObject', 'url': image,
+                   'caption': name, 'width': 1200, 'height': 1800}],
+        'recipeYield': [unicode(servings),
+                        u'{} servings'.format(servings)],
+        'prepTime': 'PT{}M'.format(prep),
+        'cookTime': 'PT{}M'.format(cook),
+        'totalTime': 'PT{}M'.format(prep + cook),
+        'recipeCategory': [category], 'recipeCuisine': [cuisine],
+        'recipeIngredient': ingredients,
+        'recipeInstructions': [{'@type': 'HowToStep', 'text': step}
+                               for step in steps],
+        'aggregateRating': {'@type': 'AggregateRating',
+                            'ratingValue': '4.9', 'ratingCount': '87'},
+        'mainEntityOfPage': url,
+    }
+    graph = {'@context': 'https://schema.org', '@graph': [
+        {'@type': 'WebPage', '@id': url, 'url': url, 'name': name},
+        {'@type': 'WebSite', '@id': site['root'] + '/#website',
+         'url': site['root'], 'name': site['name']},
+        recipe]}
+    return (u'<script type="application/ld+json" class="yoast-schema-graph">'
+            u'{}</script>\n'.format(json.dumps(graph, sort_keys=True)))
+
+
+def recipe_page(rng, site, url, name):
+    image = url + 'hero.jpg'
+    story = ''.join('<p>{}</p>\n'.format(paragraph(rng))
+                    for _ in range(8))
+    if site['image'] == 'fallback':
+        story += (u'<p><img class="aligncenter size-full wp-image-{}" '
+                  u'src="{}" alt="{}" /></p>\n').format(
+                      rng.randint(1000, 9999), image, name)
+    if site['image'] == 'img':
+        image_tag = u'<img itemprop="image" src="{}" alt="{}" />'.format(
+            image, name)
+    elif site['image'] == 'a':
+        image_tag = u'<a itemprop="image" href="{}">Pin it</a>'.format(
+            image)
+    else:
+        image_tag = u''
+    author = (u'<span itemprop="author">{}</span>'.format(site['name'])
+              if site['author'] else u'')
+    prep, cook = rng.randint(5, 30), rng.randint(10, 60)
+    ingredients = [
+        u'{} {} {}'.format(rng.choice(AMOUNTS), rng.choice(UNITS), ingredient)
+        for ingredient in rng.sample(INGREDIENTS, rng.randint(6, 14))]
+    steps = [sentence(rng, rng.randint(10, 25))
+             for _ in range(rng.randint(4, 8))]
+    description = sentence(rng, 20)
+    servings = rng.randint(2, 8)
+    category = rng.choice(('Entree', 'Dessert', 'Breakfast', 'Side'))
+    cuisine = rng.choice(('Vegan', 'Mexican', 'Indian', 'Italian'))
+    recipe = (
+        u'<div class="recipe" itemscope '
+        u'itemtype="http://schema.org/Recipe">\n'
+        u'<h2 itemprop="name">{name}</h2>{author}\n{image}\n'
+        u'<p itemprop="description">{description}</p>\n'
+        u'<div class="times">{prep}{cook}{total}</div>\n'
+        u'<span itemprop="recipeYield">{servings} servings</span>\n'
+        u'<span itemprop="recipeCategory">{category}</span>\n'
+        u'<span itemprop="recipeCuisine">{cuisine}</span>\n'
+        u'<ul class="ingredients">\n{ingredients}</ul>\n'
+        u'<ol class="instructions">\n{steps}</ol>\n</div>\n').format(
+            name=name, author=author, image=image_tag,
+            description=description,
+            prep=duration(site, 'prepTime', prep),
+            cook=duration(site, 'cookTime', cook),
+            total=duration(site, 'totalTime', prep + cook),
+            servings=servings, category=category, cuisine=cuisine,
+            ingredients=''.join(
+                u'<li itemprop="ingredients">{}</li>\n'.format(i)
+                for i in ingredients),
+            steps=''.join(
+                u'<li itemprop="recipeInstructions">{}</li>\n'.format(step)
+                for step in steps))
+    json_ld = u''
+    if site.get('json_ld'):
+        json_ld = json_ld_script(
+            site, url, name, image, description, (prep, cook), servings,
+            category, cuisine, ingredients, steps)
+    return (head(rng, site, name, json_ld) + header(rng, site) +
+            u'<main class="content"><article class="post">'
+            u'<h1 class="entry-title">{}</h1>\n'
+            u'<div class="entry-content">\n{}{}</div></article></main>\n'
+            .format(name, story, recipe) +
+            sidebar(rng, site) + footer(rng, site))
+
+
+def generate(name, klass, recipes):
+    rng = random.Random(name)
+    crawler = klass(None)
+    if crawler.get_cats_args or crawler.get_cats_kwargs:
+        crawler.recipe_index_url = crawler.root_url + '/category/dinner'
+    site = dict(SITES[name], name=name, root=crawler.root_url,
+                page_url=crawler.page_url)
+    directory = os.path.join(CORPUS, name)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    manifest = {'index': [], 'recipes': []}
+
+    def save(kind, url, html):
+        filename = '{}-{}.html'.format(kind, len(manifest[kind]))
+        with open(os.path.join(directory, filename), 'wb') as f:
+            f.write(html.encode('utf-8'))
+        manifest[kind].append([url, filename])
+
+    names = [title(rng) for _ in range(recipes)]
+    links = ['{}/{}/'.format(crawler.root_url,
+                             n.lower().replace(' ', '-')) for n in names]
+    save('index', crawler.page_url(1), index_page(
+        rng, site, crawler.page_url(1), links))
+    for link, recipe_name in zip(links, names):
+        save('recipes', link, recipe_page(rng, site, link, recipe_name))
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=1)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--recipes', type=int, default=4)
+    args = parser.parse_args(argv)
+    for name, klass in sorted(get_crawlers().items()):
+        generate(name, klass, args.recipes)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
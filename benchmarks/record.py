@@ -0,0 +1,76 @@
+"""
+Record an index page and some recipe pages for every crawler
+into benchmarks/corpus, for benchmarks/run.py to use offline.
+This replaces the checked-in pages from make_corpus.py, so save a
+new baseline after recording.
+
+    python benchmarks/record.py [--recipes N] [CrawlerName ...]
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from recipe_scrapers import log, configure_logging
+from recipe_scrapers.crawlers import get_crawlers
+
+
+CORPUS = os.path.join(os.path.dirname(__file__), 'corpus')
+
+
+def index_url(crawler):
+    """
+    The first page of recipe links the crawler would visit.
+    """
+    if crawler.get_cats_args or crawler.get_cats_kwargs:
+        category = next(iter(crawler.get_categories()))
+        crawler.recipe_index_url = category.strip('/')
+        return crawler.page_url(1)
+    if crawler.crawl == crawler._pagination_crawl:
+        return crawler.page_url(1)
+    return crawler.recipe_index_url
+
+
+def record(name, klass, recipes):
+    crawler = klass(None)
+    directory = os.path.join(CORPUS, name)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    manifest = {'index': [], 'recipes': []}
+
+    def save(kind, url):
+        filename = '{}-{}.html'.format(kind, len(manifest[kind]))
+        html = crawler.get_html(url)
+        with open(os.path.join(directory, filename), 'wb') as f:
+            f.write(html.encode('utf-8'))
+        manifest[kind].append([url, filename])
+
+    url = index_url(crawler)
+    save('index', url)
+    links = crawler.get_links(
+        url, *crawler.get_links_args, **crawler.get_links_kwargs)
+    for i, link in enumerate(links):
+        if i == recipes:
+            break
+        save('recipes', link)
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=1)
+    log.info('Recorded {} recipe pages for {}'.format(
+        len(manifest['recipes']), name))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--recipes', type=int, default=10)
+    parser.add_argument('crawlers', nargs='*')
+    args = parser.parse_args(argv)
+    configure_logging()
+    crawlers = get_crawlers()
+    for name in args.crawlers or sorted(crawlers):
+        record(name, crawlers[name], args.recipes)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
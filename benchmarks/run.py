@@ -0,0 +1,255 @@
+"""
+Offline benchmarks over the pages in benchmarks/corpus, generated by
+benchmarks/make_corpus.py (or recorded live by benchmarks/record.py).
+Measures pages/sec of the parse, fix_soup, get_recipe and get_links
+stages for every crawler with a corpus, and of parse_recipe, the
+whole recipe page path with the JSON-LD fast path first. Also
+recipes/sec of the exporters against sqlite.
+
+    python benchmarks/run.py [--save FILE] [--compare FILE]
+
+--compare reports every result more than --threshold slower than
+the saved one and exits with 1 if there are any.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from recipe_scrapers import log
+from recipe_scrapers.crawlers import Request, get_crawlers
+from recipe_scrapers.recipes import Recipe
+from recipe_scrapers.export import JSONLinesExporter
+
+
+CORPUS = os.path.join(os.path.dirname(__file__), 'corpus')
+
+
+def load_corpus(name):
+    directory = os.path.join(CORPUS, name)
+    try:
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except IOError:
+        return None
+    corpus = {}
+    for kind, pages in manifest.items():
+        corpus[kind] = []
+        for url, filename in pages:
+            with open(os.path.join(directory, filename), 'rb') as f:
+                corpus[kind].append((url, f.read().decode('utf-8')))
+    return corpus
+
+
+def rate(func, items, repeat, min_time=0.2):
+    """
+    Best items/sec of func over items, out of repeat runs.
+    Each run loops over items until it took min_time, so
+    fast stages aren't lost in the timer's resolution.
+    """
+    if not items:
+        return None
+    best = None
+    for _ in range(repeat):
+        loops = 0
+        start = time.time()
+        while True:
+            for item in items:
+                func(item)
+            loops += 1
+            elapsed = time.time() - start
+            if elapsed >= min_time:
+                break
+        best = max(best, loops * len(items) / elapsed)
+    return best
+
+
+def bench_crawler(klass, corpus, repeat):
+    crawler = klass(None)
+    pages = dict(corpus['index'] + corpus['recipes'])
+    crawler.get_html = lambda url, kind='recipe': pages[url]
+    recipes = corpus['recipes']
+
+    def parse(page):
+        return Request.make_soup(
+            crawler, page[1], page[0], crawler.recipe_strainer)
+
+    parsed = [parse(page) for page in recipes]
+    fixed = [crawler.fix_soup(parse(page)) for page in recipes]
+    with_recipe = [soup for soup in fixed if crawler.has_recipe(soup)]
+
+    def links(url):
+        return list(crawler.get_links(
+            url, *crawler.get_links_args, **crawler.get_links_kwargs))
+
+    def parse_recipe(page):
+        return crawler.parse_recipe(*page)
+
+    return {
+        'parse': rate(parse, recipes, repeat),
+        'parse_recipe': rate(parse_recipe, recipes, repeat),
+        'fix_soup': rate(crawler.fix_soup, parsed, repeat),
+        'get_recipe': rate(crawler.get_recipe, with_recipe, repeat),
+        'get_links': rate(links, [url for url, _ in corpus['index']],
+                          repeat),
+    }
+
+
+def sample_recipes(count):
+    recipes = []
+    for i in range(count):
+        recipe = Recipe()
+        recipe.url = 'http://example.com/recipe-{}'.format(i)
+        recipe.name = 'Recipe {}'.format(i)
+        recipe.author = 'Author'
+        recipe.image = 'http://example.com/{}.jpg'.format(i)
+        recipe.recipe_yield = '4 servings'
+        recipe.cook_time = 'PT20M'
+        recipe.prep_time = 'PT10M'
+        recipe.total_time = 'PT30M'
+        recipe.ingredients = ['{} cups ingredient {}'.format(n, n)
+                              for n in range(12)]
+        recipes.append(recipe)
+    return recipes
+
+
+def sqlalchemy_exporters():
+    """
+    (name, factory) for the sqlalchemy exporters over a new
+    in-memory sqlite db, empty if sqlalchemy isn't installed.
+    """
+    try:
+        from sqlalchemy import (create_engine, Column, Integer, String,
+                                Interval, ForeignKey)
+        from sqlalchemy.orm import sessionmaker, relationship, scoped_session
+        from sqlalchemy.ext.declarative import declarative_base
+    except ImportError:
+        log.warning('sqlalchemy not installed, skipping its exporters')
+        return []
+    from recipe_scrapers.export import (SQLAlchemyExporter,
+                                        BulkSQLAlchemyExporter)
+
+    Base = declarative_base()
+
+    class RecipeModel(Base):
+        __tablename__ = 'recipe'
+        id = Column(Integer, primary_key=True)
+        url = Column(String, unique=True)
+        name = Column(String)
+        author = Column(String)
+        image = Column(String)
+        recipe_yield = Column(String)
+        recipe_category = Column(String)
+        recipe_cuisine = Column(String)
+        cook_time = Column(Interval)
+        prep_time = Column(Interval)
+        total_time = Column(Interval)
+        ingredients = relationship('IngredientModel')
+
+    class IngredientModel(Base):
+        __tablename__ = 'ingredient'
+        id = Column(Integer, primary_key=True)
+        name = Column(String)
+        recipe_id = Column(Integer, ForeignKey('recipe.id'))
+
+    class DB(object):
+        def __init__(self):
+            engine = create_engine('sqlite://')
+            Base.metadata.create_all(engine)
+            self.session = scoped_session(sessionmaker(bind=engine))
+
+    def factory(klass):
+        return lambda: klass(DB(), RecipeModel, IngredientModel,
+                             lambda path: path,
+                             download_image=lambda url: url)
+
+    return [('SQLAlchemyExporter', factory(SQLAlchemyExporter)),
+            ('BulkSQLAlchemyExporter', factory(BulkSQLAlchemyExporter))]
+
+
+def bench_exporters(count, repeat):
+    tmp = tempfile.mkdtemp()
+    exporters = sqlalchemy_exporters() + [
+        ('JSONLinesExporter',
+         lambda: JSONLinesExporter(tempfile.mkdtemp(dir=tmp)))]
+    results = {}
+    try:
+        for name, factory in exporters:
+            best = None
+            for _ in range(repeat):
+                exporter = factory()
+                recipes = sample_recipes(count)
+                start = time.time()
+                for recipe in recipes:
+                    exporter.add(recipe)
+                exporter.close()
+                elapsed = time.time() - start
+                if best is None or elapsed < best:
+                    best = elapsed
+            results[name] = count / best
+    finally:
+        shutil.rmtree(tmp)
+    return results
+
+
+def run(repeat, export_count):
+    results = {}
+    for name, klass in sorted(get_crawlers().items()):
+        corpus = load_corpus(name)
+        if not corpus:
+            print '{:<24} no corpus, record it with record.py'.format(name)
+            continue
+        for stage, value in bench_crawler(klass, corpus, repeat).items():
+            if value is not None:
+                results['{}.{}'.format(name, stage)] = value
+    for name, value in bench_exporters(export_count, repeat).items():
+        results['{}.add'.format(name)] = value
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = 0
+    for key in sorted(results):
+        old = baseline.get(key)
+        new = results[key]
+        line = '{:<40} {:10.1f}/s'.format(key, new)
+        if old:
+            change = (new - old) / old
+            line += '  {:+7.1%}'.format(change)
+            if change < -threshold:
+                line += '  REGRESSION'
+                regressions += 1
+        print line
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--export-count', type=int, default=500)
+    parser.add_argument('--save')
+    parser.add_argument('--compare')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args(argv)
+    log.setLevel(logging.CRITICAL)
+
+    results = run(args.repeat, args.export_count)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
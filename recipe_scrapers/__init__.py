@@ -1,6 +1,23 @@
 import logging
 
 log = logging.getLogger('scrapers')
-log.addHandler(logging.StreamHandler())
-log.addHandler(logging.FileHandler('/tmp/rscraper.log'))
-log.setLevel(logging.DEBUG)
+log.addHandler(logging.NullHandler())
+
+_handlers = []
+
+
+def configure_logging(level=logging.INFO, filename=None):
+    """
+    Log to stderr, and to filename if given, at level.
+    Importing the package leaves logging alone, entry points
+    call this. Calling it again replaces the earlier handlers.
+    """
+    for handler in _handlers:
+        log.removeHandler(handler)
+    del _handlers[:]
+    _handlers.append(logging.StreamHandler())
+    if filename:
+        _handlers.append(logging.FileHandler(filename))
+    for handler in _handlers:
+        log.addHandler(handler)
+    log.setLevel(level)
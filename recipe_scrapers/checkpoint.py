@@ -0,0 +1,40 @@
+import os
+import json
+import threading
+
+
+class Checkpoint(object):
+    """
+    Crawl state for each crawler, kept in a json file so an
+    interrupted crawl can resume where it stopped.
+    One file can be shared by crawlers running in parallel.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self.state = json.load(f)
+        except (IOError, ValueError):
+            self.state = {}
+
+    def get(self, name):
+        with self._lock:
+            return dict(self.state.get(name, {}))
+
+    def save(self, name, **state):
+        with self._lock:
+            self.state[name] = state
+            self._write()
+
+    def clear(self, name):
+        with self._lock:
+            if self.state.pop(name, None) is not None:
+                self._write()
+
+    def _write(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+        os.rename(tmp, self.path)
@@ -1,18 +1,24 @@
+import os
 import time
-from random import randint
 import urllib2
 import re
+import functools
+from urllib import urlencode
+from collections import deque
 
-from isodate import ISO8601Error
-import requests
-import requests_cache
-from bs4 import BeautifulSoup
 from requests import HTTPError
-from requests.exceptions import InvalidSchema
-from requests.compat import urlencode
 
 from .recipes import NoRecipeException, InsufficientDataException, Recipe
+from .recipes import itemprops, first, first_attr
 from . import souputil
+from . import engine
+from . import ratelimit
+from . import httpcache
+from . import sessions
+from . import images
+from . import metrics
+from . import sitemap
+from . import jsonld
 
 from . import log
 
@@ -27,41 +33,165 @@ class EmptyPageError(Exception):
 class Request(object):
 
     base_url = None
+    root_url = None
+    # Politeness limit per host, requests/second and burst size.
+    # Cached responses don't count against it.
+    rate = 0.25
+    burst = 1
+    # Connections kept alive per host, and (connect, read) timeouts
+    pool_size = 4
+    timeout = (10, 30)
 
     def __init__(self):
-        requests_cache.install_cache()
+        # url -> Future of responses started by prefetch
+        self._prefetched = {}
 
-    def get(self, url):
+    @property
+    def site(self):
+        """
+        The site label of this crawler's metrics.
+        """
+        return self.__class__.__name__
+
+    def get(self, url, kind='recipe'):
+        """
+        kind is 'index' or 'recipe' and picks how long the
+        cached response stays fresh, see HTTPCache.ttl.
+        """
+        future = self._prefetched.pop(self._absolute(url), None)
+        if future is None:
+            future = self.fetch(url, kind)
+        with metrics.timer('rscraper_stage_seconds',
+                           site=self.site, stage='fetch'):
+            return future.result()
+
+    def fetch(self, url, kind='recipe'):
+        """
+        Submit url to the fetch engine and return a Future
+        for the response. Requests to different hosts run
+        concurrently, requests to the same host are queued.
+        """
+        url = self._absolute(url)
+        return engine.get_engine().submit(
+            engine.host_of(url), self._get, url, kind)
+
+    def prefetch(self, url, kind='recipe'):
+        """
+        Start fetching url in the background,
+        the next get(url) returns its response.
+        """
+        url = self._absolute(url)
+        if url not in self._prefetched:
+            self._prefetched[url] = self.fetch(url, kind)
+
+    def discard_prefetched(self, url=None):
+        """
+        Forget the prefetched response for url, or all of them.
+        """
+        if url is None:
+            self._prefetched.clear()
+        else:
+            self._prefetched.pop(self._absolute(url), None)
+
+    def _absolute(self, url):
         if not url.startswith('http://'):
             url = urljoin(self.root_url, url)
-        if requests_cache.get_cache().has_url(url):
-            pass
+        return url
+
+    def _get(self, url, kind):
+        sent = []
+
+        def send(url, headers):
+            r = self._send(url, headers)
+            sent.append(r.status_code)
+            return r
+
+        r = httpcache.get_cache().get(url, kind, send)
+        if not sent:
+            result = 'hit'
+        elif sent[0] == 304:
+            result = 'revalidated'
         else:
-            time.sleep(randint(3, 6))
-        r = requests.get(url)
+            result = 'miss'
+        metrics.inc('rscraper_cache_requests_total',
+                    site=self.site, result=result)
         log.info('Status code:{}'.format(r.status_code))
         if r.status_code == 404:
+            metrics.inc('rscraper_errors_total',
+                        site=self.site, stage='fetch')
             raise HTTPError('404')
         return r
 
-    def get_html(self, url):
+    def _send(self, url, headers, stream=False):
+        # Only requests that go out on the network wait for the limiter
+        limiter = ratelimit.get_limiter(
+            engine.host_of(url), self.rate, self.burst)
+        waited = limiter.acquire()
+        metrics.observe('rscraper_limiter_wait_seconds', waited,
+                        site=self.site)
+        if waited:
+            log.debug('Waited {:.2f}s for {}'.format(waited, url))
+        session = sessions.get_session(engine.host_of(url), self.pool_size)
+        r = session.get(url, headers=headers, timeout=self.timeout,
+                        stream=stream)
+        if not stream:
+            metrics.inc('rscraper_fetched_bytes_total', len(r.content),
+                        site=self.site)
+        return r
+
+    def get_html(self, url, kind='recipe'):
         """
         Return the html for a web url.
         Raises HTTPError('404') if page is not found.
         """
         log.info('Fetching page: {}'.format(url))
-        return self.get(url).text
+        return self.get(url, kind).text
 
     def get_file(self, url):
-        # TODO: Make sure is absolute url
+        """
+        Stream url into the image spool and return the path of
+        the file. Images skip the page cache, the spool keeps
+        one copy per url. Raises ImageTooLarge if it's over the spool's
+        max_size and HTTPError if the response isn't a 200.
+        Give the path back with images.get_spool().release(path)
+        once done with the file.
+        """
         log.info('Getting file:{}'.format(url))
-        return self.get(url).content
-
-    def get_soup(self, url, **kwargs):
-        html = self.get_html(url, **kwargs)
-        soup = BeautifulSoup(html, 'lxml')
+        url = self._absolute(url)
+        with metrics.timer('rscraper_stage_seconds',
+                           site=self.site, stage='get_file'):
+            try:
+                return engine.get_engine().submit(
+                    engine.host_of(url), self._get_file, url).result()
+            except Exception:
+                metrics.inc('rscraper_errors_total',
+                            site=self.site, stage='get_file')
+                raise
+
+    def _get_file(self, url):
+        spool = images.get_spool()
+        path = spool.lookup(url)
+        if path:
+            return path
+        r = self._send(url, {}, stream=True)
+        if r.status_code != 200:
+            r.close()
+            raise HTTPError(str(r.status_code))
+        path = spool.save(url, r)
+        metrics.inc('rscraper_fetched_bytes_total', os.path.getsize(path),
+                    site=self.site)
+        return path
+
+    def get_soup(self, url, parse_only=None, kind='recipe'):
+        return self.make_soup(self.get_html(url, kind), url, parse_only)
+
+    def make_soup(self, html, url, parse_only=None):
+        from bs4 import BeautifulSoup
+        with metrics.timer('rscraper_stage_seconds',
+                           site=self.site, stage='parse'):
+            soup = BeautifulSoup(html, 'lxml', parse_only=parse_only)
         soup.url = url
-        return BeautifulSoup(html, 'lxml')
+        return soup
 
 
 def absolute_urls(func):
@@ -83,14 +213,85 @@ class BaseCrawler(Request):
     # root domain usually
     root_url = ''
 
-    def __init__(self, exporter):
+    # Site fixups, applied by get_recipe to what it extracts.
+    # Author when the recipe has no author itemprop
+    default_author = None
+    # Attributes of the image itemprop tag to take the url from
+    image_attrs = ('src', )
+    # Class regex of an <img> outside the recipe to use when
+    # there's no image itemprop, recipe_strainer keeps these too.
+    image_fallback = None
+    # Attributes of the time itemprop tags holding the duration
+    time_attrs = ('datetime', )
+    # Take recipes from the page's JSON-LD when it has a complete
+    # one, the microdata is only parsed when it doesn't.
+    json_ld = True
+    # Max pages handed to parse_pool ahead of the one being yielded
+    parse_window = 32
+    # Recipe pages fetched ahead of the one being processed,
+    # 0 fetches one page at a time.
+    prefetch_depth = 4
+    # Index pages fetched ahead by pagination crawls, up to the
+    # highest page the first page links to. Crawls always end on
+    # a 404 or an empty page, 0 fetches one page at a time.
+    fan_out = 0
+    # Page number in the pagination links of page_url
+    page_number = re.compile(r'/page/(\d+)')
+    # Sitemap for use_sitemap, /sitemap.xml on the host of
+    # recipe_index_url if None. Only the sitemaps of a sitemap
+    # index matching sitemap_filter are read.
+    sitemap_url = None
+    sitemap_filter = re.compile('post')
+
+    def __init__(self, exporter, parse_pool=None, checkpoint=None,
+                 resume=False, stop_after_known=None, prefetch_depth=None,
+                 fan_out=None, use_sitemap=False):
+        """
+        parse_pool is an optional multiprocessing.Pool, recipe
+        pages are then parsed in the pool instead of in this process.
+        checkpoint is a Checkpoint the crawl position is saved to
+        after every index page, once the exporter has committed its
+        recipes. resume=True starts from the saved position.
+        stop_after_known=K ends a pagination crawl after K pages
+        in a row with only known recipes.
+        prefetch_depth and fan_out override the class defaults.
+        use_sitemap=True finds recipes in the site's sitemap instead
+        of its index pages. With a checkpoint, only pages modified
+        since the last complete sitemap crawl are fetched.
+        """
         Request.__init__(self)
         self.exporter = exporter
+        self.parse_pool = parse_pool
+        self.checkpoint = checkpoint
+        self.stop_after_known = stop_after_known
+        if prefetch_depth is not None:
+            self.prefetch_depth = prefetch_depth
+        if fan_out is not None:
+            self.fan_out = fan_out
+        self._resume = {}
+        if checkpoint and resume:
+            self._resume = checkpoint.get(self.__class__.__name__)
+            log.info('Resuming {} at {}'.format(
+                self.__class__.__name__, self._resume))
+        self._category = None
+        self._last_link = None
+        self._known_in_page = 0
         self.get_links_args = ()
         self.get_links_kwargs = {}
         self.get_cats_args = ()
         self.get_cats_kwargs = {}
         self.init()
+        if use_sitemap:
+            self.crawl = self._sitemap_crawl
+
+    @property
+    def recipe_strainer(self):
+        """
+        Recipe pages are parsed with this SoupStrainer, set it
+        to None in a subclass if fix_soup or get_recipe need
+        tags outside the recipe.
+        """
+        return souputil.get_recipe_strainer(self.image_fallback)
 
     def init(self):
         """
@@ -102,6 +303,25 @@ class BaseCrawler(Request):
     def page_url(self, page_no):
         return self.recipe_index_url + '/page/{}'.format(page_no)
 
+    def last_page(self, url):
+        """
+        Highest page number the pagination links of the index
+        page at url point to, None if there are none.
+        """
+        from bs4 import SoupStrainer
+        soup = self.get_soup(url, SoupStrainer('a', href=True), 'index')
+        last = None
+        for a in soup.find_all('a', href=True):
+            match = self.page_number.search(a['href'])
+            if not match:
+                continue
+            page_no = int(match.group(1))
+            # Only links to this index, not to other archives
+            if (urljoin(url, a['href']).rstrip('/') ==
+                    self.page_url(page_no).rstrip('/')):
+                last = page_no if last is None else max(last, page_no)
+        return last
+
     def has_recipe(self, soup):
         # TODO: Depricated, use souputil.get_recipe_soup
         r = soup.find(itemtype='http://schema.org/Recipe')
@@ -112,58 +332,66 @@ class BaseCrawler(Request):
         return soup.find(itemtype='http://schema.org/Recipe')
 
     def get_recipe(self, soup):
+        from isodate import ISO8601Error
         recipe = Recipe()
         recipe.url = url = soup.url
-        # TODO: use souputil.get_recipe_soup
-        rsoup = soup.find(itemtype='http://schema.org/Recipe')
+        rsoup = souputil.get_recipe_soup(soup)
+        props = itemprops(rsoup)
 
-        recipe.name = rsoup.find(itemprop='name').text
+        recipe.name = first(props, 'name').text
 
-        recipe.author = rsoup.find(itemprop='author').text
+        author = first(props, 'author')
+        if author is None and self.default_author:
+            recipe.author = self.default_author
+        else:
+            recipe.author = author.text
 
-        recipe.image = rsoup.find(itemprop='image')['src']
+        img = first(props, 'image')
+        if img is None and self.image_fallback:
+            img = soup.find('img', class_=self.image_fallback)
+        recipe.image = first_attr(img, self.image_attrs)
 
-        recipe.ingredients = [i.text for i in rsoup.find_all(
-            itemprprop='ingredients')]
+        recipe.ingredients = [
+            i.text for i in props.get('ingredients', ())]
 
         # Nullable attributes
         try:
-            recipe.recipe_yield = rsoup.find(itemprop='recipeYield').text
-        except AttributeError:
+            recipe.recipe_yield = props['recipeYield'][0].text
+        except KeyError:
             log.warning('Recipe at {} is missing recipeYield field'.format(
                 recipe.url))
 
         try:
-            recipe.recipe_category = rsoup.find(itemprop='recipeCategory').text
-        except AttributeError:
+            recipe.recipe_category = props['recipeCategory'][0].text
+        except KeyError:
             log.warning(
                 'No category found for recipe:{}'.format(url))
 
         try:
-            recipe.recipe_cuisine = rsoup.find(itemprop='recipeCuisine').text
-        except AttributeError:
+            recipe.recipe_cuisine = props['recipeCuisine'][0].text
+        except KeyError:
             log.warning(
                 'No cuisine property found for recipe:{}'.format(url))
 
-        def set_time(itemprop, attribute, recipe, rsoup):
-            t = rsoup.find(itemprop=itemprop)
+        def set_time(itemprop, attribute, recipe, props):
+            t = first(props, itemprop)
             if not t:
                 log.warning('No {} property on recipe {}'.format(
                     itemprop, recipe.url))
                 return
-            thetime = t['datetime']
+            thetime = first_attr(t, self.time_attrs)
             setattr(recipe, attribute, thetime)
 
         try:
-            set_time('cookTime', 'cook_time', recipe, rsoup)
+            set_time('cookTime', 'cook_time', recipe, props)
         except ISO8601Error as e:
             log.error('Recipe {}: {}'.format(url, e.message))
         try:
-            set_time('prepTime', 'prep_time', recipe, rsoup)
+            set_time('prepTime', 'prep_time', recipe, props)
         except ISO8601Error as e:
             log.error('Recipe {}: {}'.format(url, e.message))
         try:
-            set_time('totalTime', 'total_time', recipe, rsoup)
+            set_time('totalTime', 'total_time', recipe, props)
         except ISO8601Error as e:
             log.error('Recipe {}: {}'.format(url, e.message))
 
@@ -185,7 +413,7 @@ class BaseCrawler(Request):
         to find links in page.
         """
         log.info('getting links at:{}'.format(url))
-        soup = self.get_soup(url)
+        soup = self.get_soup(url, kind='index')
         for div in soup.find_all(*args, **kwargs):
             link = div.find('a').get('href')
             log.info('link:{}'.format(link))
@@ -194,16 +422,38 @@ class BaseCrawler(Request):
     def export(self, recipe):
         self.exporter.add(recipe)
 
+    def after_export(self, func):
+        """
+        Call func once the exporter has made every recipe yielded
+        so far durable, see Exporter.after_commit. The parallel
+        writer replaces this to keep func in order with the
+        recipes still on its queue.
+        """
+        if self.exporter is None:
+            func()
+        else:
+            self.exporter.after_commit(func)
+
+    def idle(self):
+        """
+        Called for every link that gives no new recipe, so time
+        based exporter work like flushing buffers still happens
+        during long runs of known or non-recipe links. The
+        parallel writer polls on its own and replaces this.
+        """
+        if self.exporter is not None:
+            self.exporter.poll()
+
     def exists(self, url):
         return self.exporter.exists(url)
 
-    def get_soup(self, url, **kwargs):
-        html = self.get_html(url, **kwargs)
-        soup = BeautifulSoup(html, 'lxml')
-        soup.url = url
-        recipe = soup.find(itemtype='http://schema.org/Recipe')
+    def make_soup(self, html, url, parse_only=None):
+        soup = Request.make_soup(self, html, url, parse_only)
+        recipe = souputil.get_recipe_soup(soup)
         if recipe:
-            return self.fix_soup(soup)
+            with metrics.timer('rscraper_stage_seconds',
+                               site=self.site, stage='fix_soup'):
+                return self.fix_soup(soup)
         else:
             return soup
 
@@ -214,59 +464,206 @@ class BaseCrawler(Request):
         """
         return soup
 
-    def _base_crawl(self, url):
+    def get_json_ld_recipe(self, url, html):
+        """
+        The Recipe in the JSON-LD of a recipe page, None if
+        there is none or it's missing fields the microdata
+        might have. Doesn't parse the page.
+        """
+        return jsonld.get_recipe(
+            jsonld.scripts(html), url, self.default_author)
+
+    def parse_recipe(self, url, html):
+        """
+        Return the Recipe in a recipe page,
+        or None if there is no recipe.
+        """
+        recipe = None
+        if self.json_ld:
+            with metrics.timer('rscraper_stage_seconds',
+                               site=self.site, stage='json_ld'):
+                try:
+                    recipe = self.get_json_ld_recipe(url, html)
+                except Exception:
+                    log.exception('Bad JSON-LD recipe at:{}'.format(url))
+        if recipe is None:
+            recipe = self._parse_microdata(url, html)
+            if recipe is None:
+                return None
+        # The exporter downloads the image, only
+        # for recipes it actually inserts.
+        if recipe.image:
+            recipe.image = urljoin(url, recipe.image)
+        return recipe
+
+    def _parse_microdata(self, url, html):
+        soup = self.make_soup(html, url, self.recipe_strainer)
+        if not self.has_recipe(soup):
+            log.error('No recipe at:{}'.format(url))
+            metrics.inc('rscraper_errors_total',
+                        site=self.site, stage='get_recipe')
+            return None
+        with metrics.timer('rscraper_stage_seconds',
+                           site=self.site, stage='get_recipe'):
+            try:
+                recipe = self.get_recipe(soup)
+            except Exception:
+                metrics.inc('rscraper_errors_total',
+                            site=self.site, stage='get_recipe')
+                raise
+        return recipe
+
+    def _pages(self, links, next_url=None):
+        """
+        Yield (link, html) for links, html is None
+        for recipes that already exist.
+        The next prefetch_depth new links are fetched in the
+        background while a page is processed, and next_url,
+        the next index page, once the links run out.
+        """
+        links = iter(links)
+        window = deque()
+        while True:
+            while len(window) <= self.prefetch_depth:
+                link = next(links, None)
+                if link is None:
+                    if next_url:
+                        self.prefetch(next_url, 'index')
+                        next_url = None
+                    break
+                if not self.exists(link):
+                    self.prefetch(link)
+                window.append(link)
+            if not window:
+                return
+            link = self._last_link = window.popleft()
+            if self.exists(link):
+                log.info('Ignoring existing recipe:"{}"'.format(link))
+                self.discard_prefetched(link)
+                self._known_in_page += 1
+                yield link, None
+            else:
+                yield link, self.get_html(link)
+
+    def _parse_in_pool(self, pages):
+        # Results come back in order, at most parse_window
+        # pages are in the pool at once.
+        window = deque()
+        for link, html in pages:
+            if html is None:
+                window.append(None)
+            else:
+                window.append(self.parse_pool.apply_async(
+                    parse_page, (self.__class__.__name__, link, html)))
+            while window and (window[0] is None or
+                              len(window) > self.parse_window):
+                result = window.popleft()
+                yield result.get() if result else None
+        while window:
+            result = window.popleft()
+            yield result.get() if result else None
+
+    def _base_crawl(self, url, next_url=None):
         log.info('Get links kwargs:{}'.format(
             self.get_links_kwargs))
         links = self.get_links(
             url,
             *self.get_links_args,
             **self.get_links_kwargs)
-        for link in links:
-            # We yield something for every link.
-            # This is so that pagination crawlers don't stop
-            # prematurely in case we run into a single page
-            # filled with only duplicate or non-recipe links.
-            # In case of duplicate or non-recipe, return None
-            # instead of a Recipe object.
-            if self.exists(link):
-                log.info('Ignoring existing recipe:"{}"'.format(link))
-                recipe = None
-                #continue
-            soup = self.get_soup(link)
-            if self.has_recipe(soup):
-                recipe = self.get_recipe(soup)
-                try:
-                    recipe.image_file = self.get_file(recipe.image)
-                except (HTTPError, InvalidSchema) as e:
-                    log.error(e.message)
-                    recipe.image_file = None
+        for recipe in self._crawl_links(links, next_url):
+            yield recipe
+
+    def _crawl_links(self, links, next_url=None):
+        # We yield something for every link.
+        # This is so that pagination crawlers don't stop
+        # prematurely in case we run into a single page
+        # filled with only duplicate or non-recipe links.
+        # In case of duplicate or non-recipe, return None
+        # instead of a Recipe object.
+        pages = self._pages(links, next_url)
+        if self.parse_pool:
+            recipes = self._parse_in_pool(pages)
+        else:
+            recipes = (self.parse_recipe(link, html) if html else None
+                       for link, html in pages)
+        for recipe in recipes:
+            if recipe:
+                metrics.inc('rscraper_recipes_total', site=self.site)
             else:
-                log.error('No recipe at:{}'.format(link))
-                recipe = None
-
-            # try:
-
-            #     recipe = self.get_recipe(soup)
-            #     #recipe = get_recipe(self.get_soup(link), link)
-            # except (NoRecipeException, InsufficientDataException) as e:
-            #     log.error(e.message)
-            #     recipe = None
-            #     #continue
-            # else:
-            #     try:
-            #         recipe.image_file = self.get_file(recipe.image)
-            #     except (HTTPError, InvalidSchema) as e:
-            #         log.error(e.message)
-            #         recipe.image_file = None
+                self.idle()
             yield recipe
 
+    def sitemap_links(self, since=None, url=None):
+        """
+        Yield the page urls of the sitemap at url, following
+        sitemap indexes. Entries with a lastmod at or before
+        since (seconds since the epoch) are skipped.
+        """
+        if url is None:
+            url = self.sitemap_url or 'http://{}/sitemap.xml'.format(
+                engine.host_of(self.recipe_index_url))
+        log.info('Reading sitemap:{}'.format(url))
+        entries = sitemap.parse_sitemap(self.get(url, 'index').content)
+        for tag, loc, lastmod in entries:
+            if since and lastmod and lastmod <= since:
+                continue
+            if tag == 'url':
+                yield loc
+            elif self.sitemap_filter.search(loc):
+                for link in self.sitemap_links(since, loc):
+                    yield link
+
+    def _sitemap_crawl(self):
+        name = self.__class__.__name__ + '.sitemap'
+        since = None
+        if self.checkpoint:
+            since = self.checkpoint.get(name).get('crawled')
+            log.info('Pages modified since {}'.format(since))
+        started = time.time()
+        for r in self._crawl_links(self.sitemap_links(since)):
+            if r:
+                yield r
+        if self.checkpoint:
+            self.after_export(functools.partial(
+                self.checkpoint.save, name, crawled=started))
+
+    def _save_checkpoint(self, category, page):
+        # Only once the recipes before it are written,
+        # so resuming can't skip past them.
+        if self.checkpoint:
+            self.after_export(functools.partial(
+                self.checkpoint.save, self.__class__.__name__,
+                category=category, page=page, link=self._last_link))
+
+    def _clear_checkpoint(self):
+        if self.checkpoint:
+            self.after_export(functools.partial(
+                self.checkpoint.clear, self.__class__.__name__))
+
     def _pagination_crawl(self):
-        page = 1
+        page = self._resume.pop('page', None) or 1
         links_in_page = 0
+        known_pages = 0
+        last = None
+        if self.fan_out:
+            try:
+                last = self.last_page(self.page_url(page))
+            except HTTPError:
+                pass
+            log.info('{} has {} pages'.format(self.page_url(page), last))
         while True:
             url = self.page_url(page)
+            next_url = self.page_url(page + 1)
+            if last is not None:
+                # Pagination bars often only link nearby pages, last
+                # only bounds the prefetching. Past it pages are
+                # probed one at a time like without fan_out.
+                for ahead in range(page + 1,
+                                   min(page + self.fan_out, last) + 1):
+                    self.prefetch(self.page_url(ahead), 'index')
+            self._known_in_page = 0
             try:
-                for r in self._base_crawl(url):
+                for r in self._base_crawl(url, next_url):
                     links_in_page += 1
                     if not r:
                         # Recipe could be None
@@ -278,13 +675,26 @@ class BaseCrawler(Request):
                 log.warning(
                     'Got 404, ending pagination crawl. {}'.format(url))
                 break
-            if links_in_page:
-                page += 1
-                links_in_page = 0
-            else:
+            if not links_in_page:
                 log.warning(
                     'No links found, ending pagination crawl. {}'.format(url))
                 break
+            if self._known_in_page == links_in_page:
+                known_pages += 1
+            else:
+                known_pages = 0
+            if self.stop_after_known and known_pages >= self.stop_after_known:
+                log.info(
+                    '{} pages of known recipes, ending pagination crawl. '
+                    '{}'.format(known_pages, url))
+                break
+            page += 1
+            links_in_page = 0
+            self._save_checkpoint(self._category, page)
+        # The prefetched next page if we stopped early
+        self.discard_prefetched()
+        if self._category is None:
+            self._clear_checkpoint()
 
     def _flat_crawl(self):
         for r in self._base_crawl(self.recipe_index_url):
@@ -295,10 +705,17 @@ class BaseCrawler(Request):
     def _category_crawl(self, paginate=True):
         categories = self.get_categories()
         crawlmethod = self._pagination_crawl if paginate else self._flat_crawl
-        for cat in categories:
+        start = self._resume.get('category') or 0
+        for i, cat in enumerate(categories):
+            if i < start:
+                continue
+            self._category = i
             self.recipe_index_url = cat.strip('/')
             for r in crawlmethod():
                 yield r
+            self._save_checkpoint(i + 1, 1)
+        self._category = None
+        self._clear_checkpoint()
 
 
 class MinimalistBakerCrawler(BaseCrawler):
@@ -323,26 +740,20 @@ class CookieAndKateCrawler(BaseCrawler):
 
     root_url = 'http://cookieandkate.com'
     recipe_index_url = 'http://cookieandkate.com/recipes'
+    default_author = 'Cookie and Kate'
+    image_attrs = ('href', )
 
     def init(self):
         self.get_links_args = ('div', )
         self.get_links_kwargs = {'class': 'lcp_catlist_item'}
         self.crawl = self._flat_crawl
 
-    def fix_soup(self, soup):
-        # TODO: set img src to img href for itemprop='image'
-        rsoup = self.recipe_soup(soup)
-        if not rsoup:
-            return soup
-        img = rsoup.find(itemprop='image')
-        img['src'] = img['href']
-        return souputil.insert_author(soup, 'Cookie and Kate')
-
 
 class NaturallyEllaCrawler(BaseCrawler):
 
     root_url = 'http://naturallyella.com'
     recipe_index_url = 'http://naturallyella.com/recipes/?'
+    page_number = re.compile(r'sf_paged=(\d+)')
 
     def init(self):
         self.get_links_args = ('div', )
@@ -389,7 +800,7 @@ class SeasonsAndSupperCrawler(BaseCrawler):
 
     @absolute_urls
     def get_links(self, url, *args, **kwargs):
-        soup = self.get_soup(url)
+        soup = self.get_soup(url, kind='index')
         for cat in soup.find_all(class_='lcp_catlist'):
             for li in cat.find_all('li'):
                 yield li.find('a').get('href')
@@ -399,51 +810,28 @@ class FoodHeavenMadeEasyCrawler(BaseCrawler):
 
     recipe_index_url = 'http://www.foodheavenmadeeasy.com/recipes'
     root_url = 'http://www.foodheavenmadeeasy.com'
+    # This site doesn't use itemprop="image" for the
+    # recipe image, take it from the wp-image-#### tag
+    image_fallback = re.compile(r'wp-image-\w+')
 
     def init(self):
         self.get_links_kwargs = {'class_': 'cat-list'}
         self.crawl = self._flat_crawl
 
-    def fix_soup(self, soup):
-        recipe = soup.find(itemtype='http://schema.org/Recipe')
-        # This site doesn't use itemprop="image" for the
-        # recipe image.
-        # Taking the image from the wp-image-#### tag
-        # and adding it as itemprop="image" under recipe schema
-        img = soup.find(class_=re.compile(r'wp-image-\w+'))
-        img['itemprop'] = 'image'
-        recipe.append(img)
-        return soup
-
 
 class SkinnyTasteCrawler(BaseCrawler):
     # Only newest recipes are schema.org compliant
 
     root_url = 'http://www.skinnytaste.com'
     recipe_index_url = 'http://www.skinnytaste.com/recipes'
+    default_author = 'Skinnytaste'
+    time_attrs = ('datetime', 'content')
 
     def init(self):
         self.get_links_args = ('div', )
         self.get_links_kwargs = {'class_': 'archive-post'}
         self.crawl = self._pagination_crawl
 
-    def fix_soup(self, soup):
-        if not self.has_recipe(soup):
-            return soup
-        rsoup = soup.find(itemtype='http://schema.org/Recipe')
-        if rsoup.find(itemprop='author'):
-            return soup
-        nt = soup.new_tag('div', itemprop='author')
-        nt.string = 'Skinnytaste'
-        rsoup.insert(3, nt)
-
-        for attr in ('totalTime', 'cookTime', 'prepTime'):
-            tag = rsoup.find(itemprop=attr)
-            if not tag:
-                continue
-            tag['datetime'] = tag['content']
-        return soup
-
 
 class DamnDeliciousCrawler(BaseCrawler):
     root_url = 'http://damndelicious.net'
@@ -465,6 +853,21 @@ def get_crawlers():
     return d
 
 
+_pool_crawlers = {}
+
+
+def parse_page(crawler_name, url, html):
+    """
+    parse_pool worker, runs parse_recipe of the crawler class
+    named crawler_name and returns the Recipe.
+    """
+    crawler = _pool_crawlers.get(crawler_name)
+    if crawler is None:
+        klass = get_crawlers()[crawler_name.split('Crawler')[0]]
+        crawler = _pool_crawlers[crawler_name] = klass(None)
+    return crawler.parse_recipe(url, html)
+
+
 # Bad crawlers below
 
 class PinchOfYumCrawler(Request):
@@ -521,7 +924,7 @@ def minimalistbakertest():
     # Perfect
     m = MinimalistBakerCrawler()
     for i in m.crawl():
-        print i.__dict__
+        print i.to_dict()
         print '\n'
 
 
@@ -529,7 +932,7 @@ def cookieandkatetest():
     # Perfect
     m = CookieAndKateCrawler()
     for i in m.crawl():
-        print i.__dict__
+        print i.to_dict()
         print '\n'
 
 
@@ -537,7 +940,7 @@ def naturallyellatest():
     # Missing categories
     m = NaturallyEllaCrawler()
     for i in m.crawl():
-        print i.__dict__
+        print i.to_dict()
         print '\n'
 
 
@@ -545,7 +948,7 @@ def sweetpotatosoultest():
     # Missing categories
     m = SweetPotatoSoulCrawler()
     for i in m.crawl():
-        print i.__dict__
+        print i.to_dict()
         print '\n'
 
 
@@ -558,7 +961,7 @@ def pinchofyumtest():
     # Ehhh
     m = PinchOfYumCrawler()
     for i in m.crawl():
-        print i.__dict__
+        print i.to_dict()
         print '\n'
 
 
@@ -566,5 +969,5 @@ def bonappetittest():
     # Messed up
     m = BonappetitCrawler()
     for i in m.crawl():
-        print i.__dict__
+        print i.to_dict()
         print '\n'
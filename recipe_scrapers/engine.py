@@ -0,0 +1,117 @@
+import sys
+import threading
+import Queue
+import urllib2
+from collections import deque
+
+from . import log
+
+
+urlparse = urllib2.urlparse.urlparse
+
+
+class Future(object):
+    """
+    Result of a job submitted to the FetchEngine.
+    result() blocks until the job is done and re-raises
+    any exception raised by the job.
+    """
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._result = None
+        self._exc_info = None
+
+    def set_result(self, result):
+        self._result = result
+        self._done.set()
+
+    def set_exception(self, exc_info):
+        self._exc_info = exc_info
+        self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self):
+        # Event.wait without a timeout can't be interrupted on py2
+        while not self._done.wait(1):
+            pass
+        if self._exc_info:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+
+class FetchEngine(object):
+    """
+    Runs fetch jobs on a pool of worker threads.
+    Jobs are queued per host and at most per_host jobs
+    for any one host are running at a time, so a slow
+    or rate limited site never holds up the others.
+    """
+
+    def __init__(self, workers=16, per_host=1):
+        self.workers = workers
+        self.per_host = per_host
+        self._ready = Queue.Queue()
+        self._pending = {}
+        self._active = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _start(self):
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._work,
+                                 name='fetch-{}'.format(len(self._threads)))
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, host, func, *args, **kwargs):
+        future = Future()
+        job = (host, future, func, args, kwargs)
+        with self._lock:
+            self._start()
+            if self._active.get(host, 0) < self.per_host:
+                self._active[host] = self._active.get(host, 0) + 1
+                self._ready.put(job)
+            else:
+                self._pending.setdefault(host, deque()).append(job)
+        return future
+
+    def _release(self, host):
+        with self._lock:
+            pending = self._pending.get(host)
+            if pending:
+                self._ready.put(pending.popleft())
+                if not pending:
+                    del self._pending[host]
+            else:
+                self._active[host] -= 1
+
+    def _work(self):
+        while True:
+            host, future, func, args, kwargs = self._ready.get()
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception:
+                log.debug('Fetch job for {} failed'.format(host))
+                future.set_exception(sys.exc_info())
+            finally:
+                self._release(host)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = FetchEngine()
+        return _engine
+
+
+def host_of(url):
+    return urlparse(url).netloc
@@ -1,66 +1,497 @@
-from . import log
+import os
+import time
+import gzip
+import json
+import shutil
+import sqlite3
+import hashlib
+import threading
+import Queue
+import multiprocessing
 
-from sqlalchemy import exists
+from . import log
+from . import metrics
+from . import images
+from .images import ImagePipeline
 
 
 class Exporter(object):
 
+    # An optional index.IngredientIndex, kept up to date
+    # with every recipe added.
+    index = None
+
+    def _index(self, recipe_id, recipe):
+        if self.index is not None:
+            self.index.add(recipe_id, recipe.ingredients)
+
     def exists(self, url):
         raise NotImplementedError
 
     def add(self, recipe):
         raise NotImplementedError
 
+    def prepare(self):
+        """
+        Called by the writer before any crawler starts, so
+        loading state happens on the writer's thread.
+        """
+        pass
+
+    def after_commit(self, func):
+        """
+        Call func once every recipe added so far is committed.
+        Crawlers save their checkpoints through this, so a crash
+        can't leave one past recipes that were never written.
+        Exporters that buffer recipes must override it.
+        """
+        func()
+
+    def poll(self):
+        """
+        Called periodically by the writer, use for time
+        based work like flushing buffers. It can be called
+        for every link crawled, so keep it cheap.
+        """
+        pass
+
+    def close(self):
+        """
+        Flush anything buffered, called once when the crawl ends.
+        """
+        pass
+
+
+class URLSet(object):
+    """
+    A set of urls, stored as 16 byte md5 digests to
+    keep large sets small in memory.
+    """
+
+    def __init__(self, urls=()):
+        self._digests = set()
+        for url in urls:
+            self.add(url)
+
+    @staticmethod
+    def _digest(url):
+        if isinstance(url, unicode):
+            url = url.encode('utf-8')
+        return hashlib.md5(url).digest()
+
+    def add(self, url):
+        self._digests.add(self._digest(url))
+
+    def __contains__(self, url):
+        return self._digest(url) in self._digests
+
+    def __len__(self):
+        return len(self._digests)
+
 
-class SQLAlchemyExporter(object):
+class SQLAlchemyExporter(Exporter):
     """
     A class for exporting recipes to an sql alchemy database.
     Pass in the db instance, recipe model and ingredients model
     and use add_recipe to add Recipe objects to the database.
+    Images are fetched with download_image (Request.get_file by
+    default, which returns the path of the downloaded file) and
+    uploaded with upload_image(path) on image_workers threads,
+    only for recipes that get inserted. The image column is filled in
+    once the upload is done. Files downloaded by the default
+    download_image are deleted from the spool after the upload,
+    with a custom download_image cleaning up is up to the caller.
     """
 
-    def __init__(self, db, recipe_model, ingredients_model, upload_image):
+    recipe_attribs = ('url',
+                      'name',
+                      'author',
+                      'recipe_yield',
+                      'recipe_category',
+                      'recipe_cuisine',
+                      'cook_time',
+                      'prep_time',
+                      'total_time')
+
+    def __init__(self, db, recipe_model, ingredients_model, upload_image,
+                 download_image=None, image_workers=4, index=None):
         self.db = db
+        self.index = index
         self.recipe_model = recipe_model
         self.ingredients_model = ingredients_model
         self.upload_image = upload_image
+        upload = upload_image
+        if download_image is None:
+            from .crawlers import Request
+            download_image = Request().get_file
+            upload = self._upload_spooled
+        self.images = ImagePipeline(download_image, upload, image_workers)
+        self.known = None
+        self._known_lock = threading.Lock()
+
+    def _upload_spooled(self, path):
+        try:
+            return self.upload_image(path)
+        finally:
+            images.get_spool().release(path)
+
+    def load_known(self):
+        """
+        Load the urls of all recipes in the db into self.known.
+        Only queries the db the first time it's called.
+        """
+        with self._known_lock:
+            if self.known is None:
+                query = self.db.session.query(self.recipe_model.url)
+                self.known = URLSet(
+                    url for url, in query.yield_per(10000))
+                log.info('Loaded {} known recipe urls'.format(
+                    len(self.known)))
+        return self.known
 
     def exists(self, url):
-        return self.db.session.query(exists().where(
-            self.recipe_model.url == url)).scalar()
+        return url in self.load_known()
+
+    def prepare(self):
+        # Crawler threads call exists(), the known urls must be
+        # loaded with the writer's session, not theirs.
+        self.load_known()
+
+    def _pk(self, rmodel):
+        return getattr(
+            rmodel, self.recipe_model.__mapper__.primary_key[0].key)
+
+    def _model(self, recipe):
+        rmodel = self.recipe_model()
+        for attrib in self.recipe_attribs:
+            setattr(rmodel, attrib,
+                    getattr(recipe, attrib))
+        return rmodel
+
+    def _submit_image(self, recipe):
+        if recipe.image:
+            self.images.submit(recipe.url, recipe.image)
+        else:
+            log.error(
+                "No image for recipe:{}".format(recipe.url))
+
+    def _set_images(self, finished):
+        """
+        Write uploaded images to their recipe rows.
+        """
+        session = self.db.session
+        for url, image in finished:
+            if image is None:
+                continue
+            session.query(self.recipe_model).filter_by(url=url).update(
+                {'image': image}, synchronize_session=False)
+        if finished:
+            session.commit()
 
     def add(self, recipe):
         log.info('Adding recipe {} to db'.format(recipe.url))
-        try:
-            image = self.upload_image(recipe.image_file)
-        except IOError:
-            log.error(
-                "Couldn't load image for recipe:{}".format(recipe.url))
-            image = None
+        self._set_images(self.images.done())
         if self.exists(recipe.url):
             return
-        rmodel = self.recipe_model()
-        for attrib in ('url',
-                       'name',
-                       'author',
-                       'recipe_yield',
-                       'recipe_category',
-                       'recipe_cuisine',
-                       'cook_time',
-                       'prep_time',
-                       'total_time'):
-            setattr(rmodel, attrib,
-                    getattr(recipe, attrib))
+        rmodel = self._model(recipe)
         rmodel.ingredients = [
             self.ingredients_model(name=ingr) for
             ingr in recipe.ingredients]
-        rmodel.image = image
-        self.db.session.merge(rmodel)
+        rmodel = self.db.session.merge(rmodel)
+        recipe_id = None
+        if self.index is not None:
+            # Before the commit expires rmodel, reading
+            # its key afterwards is another query.
+            self.db.session.flush()
+            recipe_id = self._pk(rmodel)
         self.db.session.commit()
+        self.known.add(recipe.url)
+        if recipe_id is not None:
+            self._index(recipe_id, recipe)
+        self._submit_image(recipe)
 
+    def poll(self):
+        self._set_images(self.images.done())
 
-def scrape_and_export(exporter, *crawlers):
-    crawlers = [c(exporter) for c in crawlers]
-    for crawler in crawlers:
+    def close(self):
+        self._set_images(self.images.join())
+
+
+class BulkSQLAlchemyExporter(SQLAlchemyExporter):
+    """
+    Like SQLAlchemyExporter but buffers recipes and writes them
+    with bulk inserts and a single commit every batch_size recipes
+    or flush_interval seconds, whichever comes first.
+    ingredient_fk is the ingredient column holding the recipe id.
+    Call close() at the end to write what is left in the buffer.
+    """
+
+    def __init__(self, db, recipe_model, ingredients_model, upload_image,
+                 download_image=None, image_workers=4, index=None,
+                 batch_size=200, flush_interval=30, ingredient_fk='recipe_id'):
+        SQLAlchemyExporter.__init__(
+            self, db, recipe_model, ingredients_model, upload_image,
+            download_image, image_workers, index)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.ingredient_fk = ingredient_fk
+        self.batch = []
+        self.last_flush = time.time()
+        # after_commit callbacks waiting for the batch
+        self._after_flush = []
+
+    def after_commit(self, func):
+        if self.batch:
+            self._after_flush.append(func)
+        else:
+            func()
+
+    def add(self, recipe):
+        if self.exists(recipe.url):
+            return
+        self.known.add(recipe.url)
+        self.batch.append(recipe)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+        else:
+            self.poll()
+
+    def poll(self):
+        if time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def close(self):
+        self.flush()
+        SQLAlchemyExporter.close(self)
+
+    def flush(self):
+        self.last_flush = time.time()
+        if not self.batch:
+            return
+        recipes = self.batch
+        self.batch = []
+        session = self.db.session
+        rmodels = [self._model(r) for r in recipes]
+        # return_defaults fetches the new primary keys
+        # for the ingredient rows.
+        session.bulk_save_objects(rmodels, return_defaults=True)
+        ids = [self._pk(rmodel) for rmodel in rmodels]
+        ingredients = [
+            {'name': ingr, self.ingredient_fk: recipe_id}
+            for recipe, recipe_id in zip(recipes, ids)
+            for ingr in recipe.ingredients]
+        session.bulk_insert_mappings(self.ingredients_model, ingredients)
+        session.commit()
+        callbacks, self._after_flush = self._after_flush, []
+        for func in callbacks:
+            func()
+        for recipe, recipe_id in zip(recipes, ids):
+            self._index(recipe_id, recipe)
+            self._submit_image(recipe)
+        self._set_images(self.images.done())
+        log.info('Wrote {} recipes and {} ingredients to db'.format(
+            len(rmodels), len(ingredients)))
+
+
+class JSONLinesExporter(Exporter):
+    """
+    Appends recipes as JSON lines to files in directory, no
+    database needed. A new file is started once the current one
+    is over rotate_size bytes, with compress=True rotated files
+    are gzipped. Urls are kept in a sqlite table mapping url to
+    recipe id, so exists() doesn't load everything. It's committed
+    with the file flushed first every commit_interval seconds.
+    """
+
+    def __init__(self, directory, rotate_size=64 * 1024 * 1024,
+                 compress=False, index=None, commit_interval=5):
+        self.directory = directory
+        self.index = index
+        self.rotate_size = rotate_size
+        self.compress = compress
+        self.commit_interval = commit_interval
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.urls = sqlite3.connect(os.path.join(directory, 'urls.sqlite'),
+                                    check_same_thread=False)
+        self.urls.text_factory = str
+        self.urls.execute('CREATE TABLE IF NOT EXISTS urls ('
+                          'url TEXT PRIMARY KEY, id INTEGER)')
+        self.next_id = self.urls.execute(
+            'SELECT COALESCE(MAX(id), 0) FROM urls').fetchone()[0] + 1
+        self.last_commit = time.time()
+        self._lock = threading.Lock()
+        self.file = None
+        self._uncommitted = False
+        self._after_commit = []
+
+    @staticmethod
+    def _key(url):
+        return url.encode('utf-8') if isinstance(url, unicode) else url
+
+    def exists(self, url):
+        with self._lock:
+            return self.urls.execute('SELECT 1 FROM urls WHERE url = ?',
+                                     (self._key(url), )).fetchone() is not None
+
+    def _open(self):
+        name = 'recipes-{}-{}.jsonl'.format(
+            time.strftime('%Y%m%d%H%M%S'), self.next_id)
+        self.file = open(os.path.join(self.directory, name), 'a')
+
+    def rotate(self):
+        if not self.file:
+            return
+        self.commit()
+        self.file.close()
+        if self.compress:
+            with open(self.file.name, 'rb') as src:
+                with gzip.open(self.file.name + '.gz', 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+            os.remove(self.file.name)
+        self.file = None
+
+    def add(self, recipe):
+        if self.exists(recipe.url):
+            return
+        from isodate import duration_isoformat
+        record = recipe.to_dict()
+        record['id'] = self.next_id
+        for attr in ('cook_time', 'prep_time', 'total_time'):
+            if record[attr] is not None:
+                record[attr] = duration_isoformat(record[attr])
+        if not self.file:
+            self._open()
+        self.file.write(json.dumps(record) + '\n')
+        with self._lock:
+            self.urls.execute('INSERT INTO urls VALUES (?, ?)',
+                              (self._key(recipe.url), self.next_id))
+        self._index(self.next_id, recipe)
+        self.next_id += 1
+        self._uncommitted = True
+        if self.file.tell() >= self.rotate_size:
+            self.rotate()
+        else:
+            self.poll()
+
+    def commit(self):
+        """
+        Flush the current file, then commit the urls written to it.
+        """
+        self.last_commit = time.time()
+        if self.file:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        with self._lock:
+            self.urls.commit()
+        self._uncommitted = False
+        callbacks, self._after_commit = self._after_commit, []
+        for func in callbacks:
+            func()
+
+    def after_commit(self, func):
+        if self._uncommitted:
+            self._after_commit.append(func)
+        else:
+            func()
+
+    def poll(self):
+        if time.time() - self.last_commit >= self.commit_interval:
+            self.commit()
+
+    def close(self):
+        self.rotate()
+        self.commit()
+        with self._lock:
+            self.urls.close()
+
+
+_DONE = object()
+
+
+class _AfterCommit(object):
+    """
+    Sent by a crawler thread in place of calling
+    exporter.after_commit(func) itself.
+    """
+
+    def __init__(self, func):
+        self.func = func
+
+
+def _run_crawler(crawler, queue):
+    try:
         for recipe in crawler.crawl():
-            exporter.add(recipe)
+            queue.put(recipe)
+    except Exception:
+        log.exception('Crawler {} failed'.format(
+            crawler.__class__.__name__))
+        metrics.inc('rscraper_errors_total',
+                    site=crawler.site, stage='crawl')
+    finally:
+        queue.put(_DONE)
+
+
+def scrape_and_export(exporter, *crawlers, **kwargs):
+    """
+    Run every crawler class in crawlers and add the recipes
+    to exporter.
+    With parallel=True each crawler runs in its own thread and
+    sends recipes over a bounded queue (queue_size) to the calling
+    thread, which is the only one that writes to the exporter.
+    With processes=N recipe pages are parsed in a pool of
+    N processes shared by all crawlers.
+    Other keyword arguments are passed on to the crawlers.
+    """
+    parallel = kwargs.pop('parallel', False)
+    queue_size = kwargs.pop('queue_size', 100)
+    processes = kwargs.pop('processes', None)
+    # Fork before any threads are started
+    pool = multiprocessing.Pool(processes) if processes else None
+    crawlers = [c(exporter, parse_pool=pool, **kwargs) for c in crawlers]
+    try:
+        exporter.prepare()
+        if parallel:
+            _export_parallel(exporter, crawlers, queue_size)
+        else:
+            for crawler in crawlers:
+                for recipe in crawler.crawl():
+                    _add(exporter, recipe)
+    finally:
+        exporter.close()
+        if pool:
+            pool.terminate()
+
+
+def _export_parallel(exporter, crawlers, queue_size):
+    queue = Queue.Queue(maxsize=queue_size)
+    for crawler in crawlers:
+        # Only this thread may use the exporter, it
+        # polls whenever the queue is idle.
+        crawler.idle = lambda: None
+        crawler.after_export = lambda func: queue.put(_AfterCommit(func))
+        t = threading.Thread(target=_run_crawler,
+                             args=(crawler, queue),
+                             name=crawler.__class__.__name__)
+        t.daemon = True
+        t.start()
+    running = len(crawlers)
+    while running:
+        try:
+            recipe = queue.get(timeout=1)
+        except Queue.Empty:
+            exporter.poll()
+            continue
+        if recipe is _DONE:
+            running -= 1
+            continue
+        if isinstance(recipe, _AfterCommit):
+            exporter.after_commit(recipe.func)
+            continue
+        _add(exporter, recipe)
+
+
+def _add(exporter, recipe):
+    with metrics.timer('rscraper_export_seconds',
+                       exporter=exporter.__class__.__name__):
+        exporter.add(recipe)
@@ -0,0 +1,205 @@
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from collections import namedtuple
+
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from . import log
+
+
+CacheEntry = namedtuple(
+    'CacheEntry',
+    'url status etag last_modified encoding content fetched')
+
+
+class PageStore(object):
+    """
+    Cache storage in sqlite. Bodies are zlib compressed and stored
+    once per sha1 of their content, urls point to a body. A body
+    is deleted once no url points to it.
+    When max_size (bytes of compressed bodies) is set, the least
+    recently used bodies are evicted to stay under it.
+    """
+
+    def __init__(self, path, max_size=None):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # hash -> last use, written to the db on the next store
+        self._used = {}
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.text_factory = str
+        self.conn.executescript(
+            'CREATE TABLE IF NOT EXISTS urls ('
+            'url TEXT PRIMARY KEY, hash TEXT, status INTEGER, '
+            'etag TEXT, last_modified TEXT, encoding TEXT, fetched REAL);'
+            'CREATE INDEX IF NOT EXISTS urls_hash ON urls (hash);'
+            'CREATE TABLE IF NOT EXISTS bodies ('
+            'hash TEXT PRIMARY KEY, data BLOB, size INTEGER, used REAL);'
+            'CREATE INDEX IF NOT EXISTS bodies_used ON bodies (used);')
+        self.size = self.conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM bodies').fetchone()[0]
+
+    def get(self, url):
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT u.url, u.status, u.etag, u.last_modified, '
+                'u.encoding, b.data, u.fetched, b.hash '
+                'FROM urls u JOIN bodies b ON u.hash = b.hash '
+                'WHERE u.url = ?', (url, )).fetchone()
+            if not row:
+                return None
+            self._used[row[7]] = time.time()
+        return CacheEntry(*row[:7])._replace(
+            content=zlib.decompress(row[5]))
+
+    def set(self, entry):
+        digest = hashlib.sha1(entry.content).hexdigest()
+        with self._lock:
+            if not self.conn.execute('SELECT 1 FROM bodies WHERE hash = ?',
+                                     (digest, )).fetchone():
+                data = zlib.compress(entry.content)
+                self.conn.execute(
+                    'INSERT INTO bodies VALUES (?, ?, ?, ?)',
+                    (digest, sqlite3.Binary(data), len(data), time.time()))
+                self.size += len(data)
+            self._used[digest] = time.time()
+            old = self.conn.execute('SELECT hash FROM urls WHERE url = ?',
+                                    (entry.url, )).fetchone()
+            self.conn.execute(
+                'INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (entry.url, digest, entry.status, entry.etag,
+                 entry.last_modified, entry.encoding, entry.fetched))
+            if old and old[0] != digest:
+                self._drop_unused(old[0])
+            self._write_used()
+            if self.max_size and self.size > self.max_size:
+                self._evict()
+            self.conn.commit()
+
+    def touch(self, url, fetched):
+        with self._lock:
+            self.conn.execute('UPDATE urls SET fetched = ? WHERE url = ?',
+                              (fetched, url))
+            self.conn.commit()
+
+    def _drop_unused(self, digest):
+        # A page that changed leaves its old body behind,
+        # delete it unless another url has the same body.
+        if self.conn.execute('SELECT 1 FROM urls WHERE hash = ?',
+                             (digest, )).fetchone():
+            return
+        row = self.conn.execute('SELECT size FROM bodies WHERE hash = ?',
+                                (digest, )).fetchone()
+        if row:
+            self.conn.execute('DELETE FROM bodies WHERE hash = ?',
+                              (digest, ))
+            self.size -= row[0]
+        self._used.pop(digest, None)
+
+    def _write_used(self):
+        self.conn.executemany('UPDATE bodies SET used = ? WHERE hash = ?',
+                              [(t, h) for h, t in self._used.items()])
+        self._used = {}
+
+    def _evict(self):
+        # Evict down to 90% so we don't evict on every store
+        target = self.max_size * 0.9
+        evicted = []
+        for digest, size in self.conn.execute(
+                'SELECT hash, size FROM bodies ORDER BY used').fetchall():
+            if self.size <= target:
+                break
+            evicted.append((digest, ))
+            self.size -= size
+        self.conn.executemany('DELETE FROM urls WHERE hash = ?', evicted)
+        self.conn.executemany('DELETE FROM bodies WHERE hash = ?', evicted)
+        log.info('Evicted {} pages from cache'.format(len(evicted)))
+
+
+class HTTPCache(object):
+    """
+    A cache of http responses that revalidates stale entries with
+    If-None-Match/If-Modified-Since instead of refetching them.
+    ttl maps a kind of page to the seconds an entry stays fresh,
+    None means it never goes stale.
+    """
+
+    ttl = {'index': 15 * 60,
+           'recipe': 7 * 24 * 3600}
+
+    def __init__(self, storage, ttl=None):
+        self.storage = storage
+        if ttl:
+            self.ttl = dict(self.ttl, **ttl)
+
+    def is_fresh(self, entry, kind):
+        ttl = self.ttl.get(kind)
+        return ttl is None or time.time() - entry.fetched < ttl
+
+    def get(self, url, kind, send):
+        """
+        Return the cached response for url if it is fresh for kind.
+        Otherwise call send(url, headers) with the validators of
+        the cached entry as headers, and cache the response.
+        """
+        entry = self.storage.get(url)
+        if entry and self.is_fresh(entry, kind):
+            return _response(entry)
+        headers = {}
+        if entry and entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry and entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        r = send(url, headers)
+        if r.status_code == 304 and entry:
+            log.debug('Not modified: {}'.format(url))
+            self.storage.touch(url, time.time())
+            return _response(entry)
+        if r.status_code == 200:
+            self.storage.set(CacheEntry(
+                url, r.status_code,
+                r.headers.get('ETag'), r.headers.get('Last-Modified'),
+                r.encoding, r.content, time.time()))
+        return r
+
+
+def _response(entry):
+    r = Response()
+    r.url = entry.url
+    r.status_code = entry.status
+    r.encoding = entry.encoding
+    r._content = entry.content
+    r.headers = CaseInsensitiveDict()
+    if entry.etag:
+        r.headers['ETag'] = entry.etag
+    if entry.last_modified:
+        r.headers['Last-Modified'] = entry.last_modified
+    r.from_cache = True
+    return r
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def install_cache(path='pages.sqlite', ttl=None, max_size=None):
+    """
+    Set up the process wide cache, call before crawling
+    to use another path, ttl policy or size limit.
+    """
+    global _cache
+    with _cache_lock:
+        _cache = HTTPCache(PageStore(path, max_size), ttl)
+        return _cache
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HTTPCache(PageStore('pages.sqlite'))
+        return _cache
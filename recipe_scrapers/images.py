@@ -0,0 +1,172 @@
+import os
+import hashlib
+import tempfile
+import threading
+import Queue
+
+from . import log
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+class ImageSpool(object):
+    """
+    Streams image downloads to files in directory, capped at
+    max_size bytes. Files are named by the sha1 of their content,
+    so an image served under several urls is stored once.
+    Every path returned by save or lookup must be given back
+    with release(path), the file is deleted once all are.
+    """
+
+    def __init__(self, directory, max_size=8 * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._paths = {}
+        # path -> number of unreleased save/lookup results
+        self._refs = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, url):
+        with self._lock:
+            path = self._paths.get(url)
+            if path:
+                self._refs[path] += 1
+            return path
+
+    def release(self, path):
+        with self._lock:
+            refs = self._refs.get(path, 1) - 1
+            if refs > 0:
+                self._refs[path] = refs
+                return
+            self._refs.pop(path, None)
+            for url in [u for u, p in self._paths.items() if p == path]:
+                del self._paths[url]
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def save(self, url, response):
+        """
+        Write the body of a response made with stream=True,
+        return the path of the file.
+        """
+        length = response.headers.get('Content-Length')
+        if length and int(length) > self.max_size:
+            response.close()
+            raise ImageTooLarge('{} is {} bytes'.format(url, length))
+        ext = os.path.splitext(
+            response.url.split('?')[0])[1][:5].lower() or '.img'
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        sha = hashlib.sha1()
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in response.iter_content(64 * 1024):
+                    size += len(chunk)
+                    if size > self.max_size:
+                        raise ImageTooLarge(
+                            '{} is over {} bytes'.format(url, self.max_size))
+                    sha.update(chunk)
+                    f.write(chunk)
+        except Exception:
+            os.remove(tmp)
+            raise
+        finally:
+            response.close()
+        path = os.path.join(self.directory, sha.hexdigest() + ext)
+        # Under the lock so release() can't delete path in between
+        with self._lock:
+            if os.path.exists(path):
+                os.remove(tmp)
+            else:
+                os.rename(tmp, path)
+            self._paths[url] = path
+            self._refs[path] = self._refs.get(path, 0) + 1
+        return path
+
+
+_spool = None
+_spool_lock = threading.Lock()
+
+
+def install_spool(directory, max_size=8 * 1024 * 1024):
+    global _spool
+    with _spool_lock:
+        _spool = ImageSpool(directory, max_size)
+        return _spool
+
+
+def get_spool():
+    global _spool
+    with _spool_lock:
+        if _spool is None:
+            _spool = ImageSpool(
+                os.path.join(tempfile.gettempdir(), 'rscraper-images'))
+        return _spool
+
+
+class ImagePipeline(object):
+    """
+    Downloads and uploads recipe images on a pool of threads.
+    submit(key, url) queues an image, done() returns the
+    finished (key, image) pairs where image is the return value
+    of upload, or None if the download or upload failed.
+    """
+
+    def __init__(self, download, upload, workers=4):
+        self.download = download
+        self.upload = upload
+        self.workers = workers
+        self._jobs = Queue.Queue(maxsize=workers * 4)
+        self._results = Queue.Queue()
+        self._threads = []
+
+    def _start(self):
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._work,
+                                 name='image-{}'.format(len(self._threads)))
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, key, url):
+        """
+        Queue the image at url, blocks while the pool is full.
+        """
+        self._start()
+        self._jobs.put((key, url))
+
+    def _work(self):
+        while True:
+            key, url = self._jobs.get()
+            try:
+                image = self.upload(self.download(url))
+            except Exception:
+                log.exception('Image {} failed for {}'.format(url, key))
+                image = None
+            self._results.put((key, image))
+            self._jobs.task_done()
+
+    def done(self):
+        """
+        Return the (key, image) pairs finished so far.
+        """
+        finished = []
+        while True:
+            try:
+                finished.append(self._results.get_nowait())
+            except Queue.Empty:
+                return finished
+
+    def join(self):
+        """
+        Wait for every submitted image, then return done().
+        """
+        self._jobs.join()
+        return self.done()
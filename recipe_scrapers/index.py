@@ -0,0 +1,188 @@
+import re
+import cPickle
+from array import array
+from bisect import bisect_left
+
+
+# Units, quantities and preparation words that
+# say nothing about what's in a recipe.
+STOPWORDS = frozenset((
+    'and', 'or', 'of', 'the', 'for', 'into', 'with', 'about', 'plus',
+    'cup', 'tablespoon', 'teaspoon', 'tbsp', 'tsp', 'ounce', 'pound',
+    'gram', 'kg', 'ml', 'liter', 'litre', 'pinch', 'dash', 'handful',
+    'large', 'medium', 'small', 'whole', 'fresh', 'dried', 'chopped',
+    'minced', 'diced', 'sliced', 'grated', 'peeled', 'finely',
+    'roughly', 'thinly', 'optional', 'taste', 'divided', 'package',
+    'can', 'clove', 'piece', 'lb', 'oz'))
+
+WORD = re.compile(r'[a-z]+')
+
+
+def normalize(word):
+    """
+    Lowercase, crudely singularized form of word.
+    """
+    word = word.lower()
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith('oes'):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def tokens(ingredient):
+    """
+    Normalized tokens of an ingredient string.
+    """
+    for word in WORD.findall(ingredient.lower()):
+        word = normalize(word)
+        if len(word) > 2 and word not in STOPWORDS:
+            yield word
+
+
+def _insert(postings, recipe_id):
+    # Ids mostly arrive in increasing order, so this is
+    # almost always an append.
+    if not postings or postings[-1] < recipe_id:
+        postings.append(recipe_id)
+        return
+    i = bisect_left(postings, recipe_id)
+    if i == len(postings) or postings[i] != recipe_id:
+        postings.insert(i, recipe_id)
+
+
+def _intersect(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    out = array('L')
+    lo = 0
+    for x in a:
+        lo = bisect_left(b, x, lo)
+        if lo == len(b):
+            break
+        if b[lo] == x:
+            out.append(x)
+    return out
+
+
+def _union(a, b):
+    return array('L', sorted(set(a).union(b)))
+
+
+def _difference(a, b):
+    b = set(b)
+    return array('L', (x for x in a if x not in b))
+
+
+class QuerySyntaxError(Exception):
+    pass
+
+
+class _Parser(object):
+
+    def __init__(self, index, q):
+        self.index = index
+        self.q = q
+        self.tokens = re.findall(r'[&|!()]|[^\s&|!()]+', q)
+        self.pos = 0
+
+    def parse(self):
+        result = self._expr()
+        if self.pos != len(self.tokens):
+            raise QuerySyntaxError(self.q)
+        return result
+
+    def _peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+
+    def _next(self):
+        token = self._peek()
+        if token is None:
+            raise QuerySyntaxError('Unexpected end of query')
+        self.pos += 1
+        return token
+
+    def _expr(self):
+        result = self._term()
+        while self._peek() == '|':
+            self._next()
+            result = _union(result, self._term())
+        return result
+
+    def _term(self):
+        # Negated factors are subtracted from the positive ones,
+        # only a term with no positive factor touches every id.
+        include, exclude = [], []
+        while True:
+            negate = False
+            while self._peek() == '!':
+                self._next()
+                negate = not negate
+            (exclude if negate else include).append(self._factor())
+            if self._peek() != '&':
+                break
+            self._next()
+        if include:
+            include.sort(key=len)
+            result = include[0]
+            for postings in include[1:]:
+                result = _intersect(result, postings)
+        else:
+            result = self.index.ids
+        for postings in exclude:
+            result = _difference(result, postings)
+        return result
+
+    def _factor(self):
+        token = self._next()
+        if token == '(':
+            result = self._expr()
+            if self._next() != ')':
+                raise QuerySyntaxError('Expected )')
+            return result
+        if token in '&|!)':
+            raise QuerySyntaxError('Unexpected {}'.format(token))
+        words = list(tokens(token)) or [normalize(token)]
+        postings = self.index.postings
+        result = postings.get(words[0], array('L'))
+        for word in words[1:]:
+            result = _intersect(result, postings.get(word, array('L')))
+        return result
+
+
+class IngredientIndex(object):
+    """
+    Inverted index from ingredient tokens to recipe ids,
+    kept as sorted arrays. Query it with the same syntax as
+    postgres tsquery: & (and), | (or), ! (not) and parentheses,
+    e.g. 'tomato & garlic & !onion'.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.ids = array('L')
+
+    def add(self, recipe_id, ingredients):
+        _insert(self.ids, recipe_id)
+        for token in set(t for i in ingredients for t in tokens(i)):
+            _insert(self.postings.setdefault(token, array('L')), recipe_id)
+
+    def query(self, q):
+        """
+        Return the sorted ids of recipes matching q.
+        """
+        return list(_Parser(self, q).parse())
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            cPickle.dump((self.ids, self.postings), f, cPickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with open(path, 'rb') as f:
+            index.ids, index.postings = cPickle.load(f)
+        return index
@@ -0,0 +1,136 @@
+import re
+import json
+from HTMLParser import HTMLParser
+
+from . import log
+from .recipes import Recipe
+
+
+# application/ld+json scripts, found without parsing the page
+SCRIPT = re.compile(
+    r'<script[^>]*\btype\s*=\s*["\']?application/ld\+json["\']?[^>]*>'
+    r'(.*?)</script\s*>', re.I | re.S)
+
+_unescape = HTMLParser().unescape
+
+
+def scripts(html):
+    return SCRIPT.findall(html)
+
+
+def _find(data):
+    if isinstance(data, list):
+        for item in data:
+            found = _find(item)
+            if found is not None:
+                return found
+    elif isinstance(data, dict):
+        types = data.get('@type')
+        if types == 'Recipe' or (isinstance(types, list) and
+                                 'Recipe' in types):
+            return data
+        if '@graph' in data:
+            return _find(data['@graph'])
+    return None
+
+
+def find_recipe(texts):
+    """
+    The first schema.org Recipe object in the JSON-LD texts,
+    looking inside lists and @graph, or None.
+    """
+    for text in texts:
+        try:
+            data = json.loads(text.strip())
+        except ValueError:
+            log.debug('Invalid JSON-LD: {!r}'.format(text[:80]))
+            continue
+        recipe = _find(data)
+        if recipe is not None:
+            return recipe
+    return None
+
+
+def _text(value):
+    # First string in a string, number, object with a name
+    # (authors) or text, or a list of those.
+    if isinstance(value, list):
+        for item in value:
+            text = _text(item)
+            if text:
+                return text
+        return None
+    if isinstance(value, dict):
+        value = value.get('name') or value.get('text')
+    if isinstance(value, (int, float)):
+        value = unicode(value)
+    if isinstance(value, basestring):
+        return _unescape(value).strip() or None
+    return None
+
+
+def _url(value):
+    # First url in a string, an ImageObject (never its name or
+    # caption) or a list of those.
+    if isinstance(value, list):
+        for item in value:
+            url = _url(item)
+            if url:
+                return url
+        return None
+    if isinstance(value, dict):
+        value = (value.get('url') or value.get('contentUrl') or
+                 value.get('@id'))
+    if isinstance(value, basestring):
+        return _unescape(value).strip() or None
+    return None
+
+
+def to_recipe(data, url):
+    """
+    Map a JSON-LD Recipe object to a Recipe.
+    """
+    from isodate import ISO8601Error
+    recipe = Recipe()
+    recipe.url = url
+    recipe.name = _text(data.get('name'))
+    recipe.author = _text(data.get('author'))
+    recipe.image = _url(data.get('image'))
+    recipe.recipe_yield = _text(data.get('recipeYield'))
+    recipe.recipe_category = _text(data.get('recipeCategory'))
+    recipe.recipe_cuisine = _text(data.get('recipeCuisine'))
+    ingredients = data.get('recipeIngredient') or data.get('ingredients')
+    if isinstance(ingredients, basestring):
+        ingredients = [ingredients]
+    recipe.ingredients = [
+        i for i in (_text(i) for i in ingredients or ()) if i]
+    for key, attribute in (('cookTime', 'cook_time'),
+                           ('prepTime', 'prep_time'),
+                           ('totalTime', 'total_time')):
+        value = _text(data.get(key))
+        if not value:
+            continue
+        try:
+            setattr(recipe, attribute, value)
+        except ISO8601Error as e:
+            log.error('Recipe {}: {}'.format(url, e.message))
+    return recipe
+
+
+def get_recipe(texts, url, default_author=None):
+    """
+    The Recipe in the JSON-LD texts of the page at url, None
+    unless it has a name, ingredients, an image and an author
+    (default_author if it has none).
+    """
+    data = find_recipe(texts)
+    if data is None:
+        return None
+    recipe = to_recipe(data, url)
+    if recipe.author is None:
+        recipe.author = default_author
+    if (recipe.name and recipe.ingredients and recipe.image and
+            recipe.author):
+        return recipe
+    log.info('Incomplete JSON-LD recipe at {}'.format(url))
+    return None
@@ -1,70 +1,32 @@
 import time
+import threading
 
-import isodate
 import requests
 import requests_cache
 from bs4 import BeautifulSoup
 from requests import HTTPError
-from datetime import timedelta
 
+from .recipes import NoRecipeException, Recipe
 
 
-class NoRecipeException(Exception):
-    pass
+_cache_installed = False
+_cache_lock = threading.Lock()
 
 
-class Recipe(object):
-    url = None
-    name = None
-    image = None
-    author = None
-    recipe_yield = None
-    _cook_time = None
-    _prep_time = None
-    _total_time = None
-    ingredients = None
-
-    def __init__(self):
-        self.ingredients = []
-
-    def _time_setter(self, attr, value):
-        if isinstance(value, basestring):
-            setattr(self, attr, isodate.parse_duration(value))
-        elif isinstance(value, timedelta):
-            setattr(self, attr, value)
-        else:
-            raise TypeError('Value {} is of unsupported type for a timedelta')
-
-    @property
-    def cook_time(self):
-        return self._cook_time
-
-    @cook_time.setter
-    def cook_time(self, value):
-        self._time_setter('_cook_time', value)
-
-    @property
-    def prep_time(self):
-        return self._prep_time
-
-    @prep_time.setter
-    def prep_time(self, value):
-        self._time_setter('_prep_time', value)
-
-    @property
-    def total_time(self):
-        return self._total_time
-
-    @total_time.setter
-    def total_time(self, value):
-        self._time_setter('_total_time', value)
+def _install_cache():
+    # Once per process, not for every MBaker
+    global _cache_installed
+    with _cache_lock:
+        if not _cache_installed:
+            requests_cache.install_cache()
+            _cache_installed = True
 
 
 class MBaker(object):
 
     def __init__(self):
         self.base_url = 'http://minimalistbaker.com/recipes/'
-        requests_cache.install_cache()
+        _install_cache()
 
     # Todo: requests stuff should be outside class
     def get_html(self, url):
@@ -0,0 +1,144 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from . import log
+
+
+# Upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Histogram(object):
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value):
+    return unicode(value).replace('\\', r'\\').replace(
+        '"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        u'{}="{}"'.format(k, _escape(v)) for k, v in labels) + '}'
+
+
+class Registry(object):
+    """
+    Counters and latency histograms keyed by name and labels.
+    Hooks added with add_hook(hook) are called as
+    hook(name, value, labels) for every inc and observe,
+    dump() returns everything in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._call_hooks(name, value, labels)
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+        self._call_hooks(name, value, labels)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Observe the seconds spent in the with block,
+        whether it raises or not.
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(name, time.time() - start, **labels)
+
+    def add_hook(self, hook):
+        with self._lock:
+            self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        with self._lock:
+            self._hooks.remove(hook)
+
+    def _call_hooks(self, name, value, labels):
+        for hook in list(self._hooks):
+            try:
+                hook(name, value, labels)
+            except Exception:
+                log.exception('Metrics hook {} failed'.format(hook))
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def dump(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (h.buckets, list(h.counts), h.sum, h.count))
+                for key, h in self._histograms.items())
+        lines = []
+        last = None
+        for (name, labels), value in counters:
+            if name != last:
+                lines.append('# TYPE {} counter'.format(name))
+                last = name
+            lines.append(u'{}{} {}'.format(
+                name, _format_labels(labels), value))
+        for (name, labels), (buckets, counts, total, count) in histograms:
+            if name != last:
+                lines.append('# TYPE {} histogram'.format(name))
+                last = name
+            cumulative = 0
+            for bound, n in zip(buckets + ('+Inf', ), counts):
+                cumulative += n
+                lines.append(u'{}_bucket{} {}'.format(
+                    name, _format_labels(labels + (('le', bound), )),
+                    cumulative))
+            lines.append(u'{}_sum{} {!r}'.format(
+                name, _format_labels(labels), total))
+            lines.append(u'{}_count{} {}'.format(
+                name, _format_labels(labels), count))
+        return u'\n'.join(lines) + u'\n'
+
+
+_registry = Registry()
+
+
+def get_registry():
+    return _registry
+
+
+inc = _registry.inc
+observe = _registry.observe
+timer = _registry.timer
+add_hook = _registry.add_hook
+remove_hook = _registry.remove_hook
+dump = _registry.dump
+reset = _registry.reset
@@ -0,0 +1,46 @@
+import time
+import threading
+
+
+class TokenBucket(object):
+    """
+    Allows `rate` requests per second on average with bursts
+    of up to `burst` requests. acquire() blocks until a token
+    is available and returns the number of seconds waited.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.time()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Take the token now, even if it's not there yet,
+            # so concurrent callers queue up behind each other.
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(host, rate, burst=1):
+    """
+    Return the shared TokenBucket for host, creating it
+    with the given rate and burst on first use.
+    """
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = TokenBucket(rate, burst)
+        return _limiters[host]
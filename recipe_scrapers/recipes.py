@@ -1,9 +1,7 @@
 import re
 
-import isodate
 from . import log
 from datetime import timedelta
-from isodate.isoerror import ISO8601Error
 
 
 class NoRecipeException(Exception):
@@ -13,25 +11,79 @@ class InsufficientDataException(Exception):
     pass
 
 
+_durations = {}
+
+
+def parse_duration(value):
+    """
+    isodate.parse_duration, memoized since the same few
+    durations (PT10M, PT1H, ...) come up over and over.
+    """
+    try:
+        return _durations[value]
+    except KeyError:
+        import isodate
+        if len(_durations) > 10000:
+            _durations.clear()
+        duration = _durations[value] = isodate.parse_duration(value)
+        return duration
+
+
+def _recipe_from_tuple(values):
+    return Recipe.from_tuple(values)
+
+
 class Recipe(object):
-    url = None
-    name = None
-    image = None
-    author = None
-    recipe_yield = None
-    recipe_category = None
-    recipe_cuisine = None
-    _cook_time = None
-    _prep_time = None
-    _total_time = None
-    ingredients = None
+
+    fields = ('url',
+              'name',
+              'image',
+              'author',
+              'recipe_yield',
+              'recipe_category',
+              'recipe_cuisine',
+              'cook_time',
+              'prep_time',
+              'total_time',
+              'ingredients')
+
+    # Same order as fields
+    __slots__ = ('url',
+                 'name',
+                 'image',
+                 'author',
+                 'recipe_yield',
+                 'recipe_category',
+                 'recipe_cuisine',
+                 '_cook_time',
+                 '_prep_time',
+                 '_total_time',
+                 'ingredients')
 
     def __init__(self):
+        for attr in self.__slots__:
+            setattr(self, attr, None)
         self.ingredients = []
 
+    def to_tuple(self):
+        return tuple(getattr(self, f) for f in self.fields)
+
+    @classmethod
+    def from_tuple(cls, values):
+        recipe = cls.__new__(cls)
+        for attr, value in zip(cls.__slots__, values):
+            setattr(recipe, attr, value)
+        return recipe
+
+    def to_dict(self):
+        return dict(zip(self.fields, self.to_tuple()))
+
+    def __reduce__(self):
+        return _recipe_from_tuple, (self.to_tuple(), )
+
     def _time_setter(self, attr, value):
         if isinstance(value, basestring):
-            setattr(self, attr, isodate.parse_duration(value))
+            setattr(self, attr, parse_duration(value))
         elif isinstance(value, timedelta):
             setattr(self, attr, value)
         else:
@@ -63,41 +115,101 @@ class Recipe(object):
         self._time_setter('_total_time', value)
 
 
-def get_recipe(soup, url):
+def itemprops(soup):
+    """
+    Collect every tag with an itemprop under soup in a single
+    pass. Returns a dict of itemprop -> list of tags,
+    in document order.
+    """
+    from bs4 import Tag
+    props = {}
+    for tag in soup.descendants:
+        if not isinstance(tag, Tag):
+            continue
+        prop = tag.get('itemprop')
+        if prop is not None:
+            props.setdefault(prop, []).append(tag)
+    return props
+
+
+def first(props, itemprop):
+    tags = props.get(itemprop)
+    return tags[0] if tags else None
+
+
+def first_attr(tag, attrs):
+    """
+    Value of the first of attrs that tag has.
+    """
+    for attr in attrs:
+        if tag.has_attr(attr):
+            return tag[attr]
+    raise KeyError(attrs[0])
+
+
+AUTHOR_PROPERTY = re.compile('^(.*)author$')
+SITE_NAME_PROPERTY = re.compile('^(.*)site_name$')
+
+
+def _author_tags(props, bigsoup):
+    """
+    Yield author candidates in order of preference.
+    The property fallbacks share one pass over the page,
+    which only goes as far as the caller needs.
+    """
+    from bs4 import Tag
+    yield first(props, 'author'), {'itemprop': 'author'}
+    author = site_name = None
+    for tag in bigsoup.descendants:
+        prop = tag.get('property') if isinstance(tag, Tag) else None
+        if not prop:
+            continue
+        if site_name is None and SITE_NAME_PROPERTY.search(prop):
+            site_name = tag
+        if author is None and AUTHOR_PROPERTY.search(prop):
+            author = tag
+            yield author, {'property': AUTHOR_PROPERTY}
+        if author is not None and site_name is not None:
+            break
+    yield site_name, {'property': SITE_NAME_PROPERTY}
+
+
+def get_recipe(soup, url, json_ld=True):
     """
     Given a BeautifulSoup object, finds a hrecipe by
     searching for a container with the:
     itemtype='http://schema.org/Recipe
+    A complete JSON-LD recipe on the page is used first,
+    unless json_ld is False.
     """
+    from . import jsonld
     log.info('Scraping {}'.format(url))
+    if json_ld:
+        recipe = jsonld.get_recipe(
+            (script.string or '' for script in soup.find_all(
+                'script', type='application/ld+json')), url)
+        if recipe is not None:
+            return recipe
     bigsoup = soup
     soup = bigsoup.find(itemtype='http://schema.org/Recipe')
     if not soup:
         raise NoRecipeException(
             'No recipe found at: {}'.format(url))
+    props = itemprops(soup)
 
     recipe = Recipe()
     recipe.url = url
 
-    recipe.name = soup.find(itemprop='name').text
-
-    img = soup.find(itemprop='image')
+    recipe.name = first(props, 'name').text
 
+    img = first(props, 'image')
 
     for tag in ('src', 'srcset', 'content', 'href'):
         if tag in img.attrs:
             recipe.image = img.get(tag)
             break
 
-    attrs = [(soup, {'itemprop': 'author'}),
-             (bigsoup, {'property': re.compile('^(.*)author$')}),
-             #(bigsoup, {'class': re.compile('^(.*)author$')}),
-             (bigsoup, {'property': re.compile('^(.*)site_name$')}),
-         ]
-
-    auth = None
-    for s, a in attrs:
-        auth = s.find(attrs=a)
+    for auth, a in _author_tags(props, bigsoup):
         if auth:
             author = auth.text
             if not author:
@@ -112,31 +224,28 @@ def get_recipe(soup, url):
             'No author found for recipe: {}'.format(url))
 
     try:
-        recipe.recipe_yield = soup.find_all(
-            attrs={'itemprop': 'recipeYield'})[0].text
-    except IndexError:
+        recipe.recipe_yield = props['recipeYield'][0].text
+    except KeyError:
         log.warning('Recipe at {} is missing recipeYield field'.format(url))
 
     # TODO: Find another way to get category
     try:
-        recipe.recipe_category = soup.find_all(
-            attrs={'itemprop': 'recipeCategory'})[0].text
-    except IndexError:
+        recipe.recipe_category = props['recipeCategory'][0].text
+    except KeyError:
         log.warning(
             'No category found for recipe:{}'.format(url))
 
     try:
-        recipe.recipe_cuisine = soup.find_all(
-            attrs={'itemprop': 'recipeCuisine'})[0].text
-    except IndexError:
+        recipe.recipe_cuisine = props['recipeCuisine'][0].text
+    except KeyError:
         log.warning(
             'No cuisine property found for recipe:{}'.format(url))
 
-    time_setter('cookTime', 'cook_time', recipe, soup)
-    time_setter('prepTime', 'prep_time', recipe, soup)
-    time_setter('totalTime', 'total_time', recipe, soup)
+    time_setter('cookTime', 'cook_time', recipe, props)
+    time_setter('prepTime', 'prep_time', recipe, props)
+    time_setter('totalTime', 'total_time', recipe, props)
 
-    for ingtag in soup.find_all(attrs={'itemprop': 'ingredients'}):
+    for ingtag in props.get('ingredients', ()):
         recipe.ingredients.append(ingtag.text)
 
     #log.info('Result: {}'.format(recipe.__dict__))
@@ -144,8 +253,9 @@ def get_recipe(soup, url):
     return recipe
 
 
-def time_setter(itemprop, attribute, recipe, soup):
-    t = soup.find(attrs={'itemprop': itemprop})
+def time_setter(itemprop, attribute, recipe, props):
+    from isodate import ISO8601Error
+    t = first(props, itemprop)
     if not t:
         log.warning('No {} itemprop on recipe {}'.format(
             itemprop, recipe.url))
@@ -0,0 +1,31 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def make_session(pool_size=4, retries=2):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1,
+                          pool_maxsize=pool_size,
+                          max_retries=retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Accept-Encoding'] = 'gzip, deflate'
+    return session
+
+
+def get_session(host, pool_size=4, retries=2):
+    """
+    Return the keep-alive session for host, every host gets its
+    own connection pool. pool_size and retries only apply when
+    the session is created.
+    """
+    with _sessions_lock:
+        if host not in _sessions:
+            _sessions[host] = make_session(pool_size, retries)
+        return _sessions[host]
@@ -0,0 +1,51 @@
+import io
+import gzip
+import calendar
+from datetime import datetime
+
+
+NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+
+def parse_lastmod(value):
+    """
+    Seconds since the epoch of a W3C datetime, naive
+    values are taken as UTC. None if it can't be parsed.
+    """
+    import isodate
+    value = value.strip()
+    try:
+        if 'T' in value:
+            dt = isodate.parse_datetime(value)
+        else:
+            dt = datetime.combine(isodate.parse_date(value),
+                                  datetime.min.time())
+    except (ValueError, isodate.ISO8601Error):
+        return None
+    if dt.tzinfo is not None:
+        return calendar.timegm(dt.utctimetuple())
+    return calendar.timegm(dt.timetuple())
+
+
+def parse_sitemap(content):
+    """
+    Yield (tag, loc, lastmod) for every entry of a sitemap or
+    sitemap index, tag is 'url' or 'sitemap' and lastmod is
+    seconds since the epoch or None. content may be gzipped.
+    Elements are freed as they are parsed, so big sitemaps
+    don't build a whole tree.
+    """
+    from lxml import etree
+    f = io.BytesIO(content)
+    if content[:2] == '\x1f\x8b':
+        f = gzip.GzipFile(fileobj=f)
+    for _, elem in etree.iterparse(
+            f, tag=(NS + 'url', NS + 'sitemap'), recover=True):
+        loc = elem.findtext(NS + 'loc')
+        lastmod = elem.findtext(NS + 'lastmod')
+        if loc:
+            yield (elem.tag[len(NS):], loc.strip(),
+                   parse_lastmod(lastmod) if lastmod else None)
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
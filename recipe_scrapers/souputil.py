@@ -1,22 +1,42 @@
-def get_recipe_soup(soup):
-    return soup.find(itemtype='http://schema.org/Recipe')
+RECIPE_TYPE = 'http://schema.org/Recipe'
 
 
-def insert_author(soup, author_name, force=False):
+def make_recipe_strainer(image_class=None):
     """
-    Inserts an itemprop='author' tag if it's missing.
-    If force=True, overrides previous author tag with
-    given author_name.
+    Returns a SoupStrainer that keeps only the recipe container
+    and the <meta> tags (for author fallbacks), plus <img> tags
+    with a class matching the image_class regex if given.
+    Pass it as parse_only to BeautifulSoup.
     """
-    rsoup = get_recipe_soup(soup)
-    oldtag = rsoup.find(itemprop='author')
-    if oldtag:
-        if force:
-            oldtag.string = author_name
-        else:
-            pass
-        return soup
-    nt = soup.new_tag('div', itemprop='author')
-    nt.string = author_name
-    rsoup.insert(3, nt)
-    return soup
+    from bs4 import SoupStrainer
+
+    def match(name, attrs):
+        if name == 'meta' or attrs.get('itemtype') == RECIPE_TYPE:
+            return True
+        if image_class and name == 'img':
+            cls = attrs.get('class') or ''
+            if isinstance(cls, list):
+                cls = ' '.join(cls)
+            return bool(image_class.search(cls))
+        return False
+    return SoupStrainer(match)
+
+
+_strainers = {}
+
+
+def get_recipe_strainer(image_class=None):
+    """
+    Shared make_recipe_strainer(image_class), built on first use
+    so importing the crawlers doesn't import bs4.
+    """
+    try:
+        return _strainers[image_class]
+    except KeyError:
+        strainer = _strainers[image_class] = make_recipe_strainer(
+            image_class)
+        return strainer
+
+
+def get_recipe_soup(soup):
+    return soup.find(itemtype=RECIPE_TYPE)
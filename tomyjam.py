@@ -1,5 +1,6 @@
 import sys
 import os
+import logging
 from collections import OrderedDict
 
 thisdir = os.path.dirname(os.path.realpath(__file__))
@@ -14,14 +15,22 @@ from myjam.models import Recipe, Ingredient
 from myjam.file_mgmt import upload_image
 from recipe_scrapers.export import SQLAlchemyExporter, scrape_and_export
 from recipe_scrapers.crawlers import get_crawlers
-from recipe_scrapers import log, logging
+from recipe_scrapers import log, configure_logging
+
+
+def upload_spooled(path):
+    # upload_image takes the image bytes, the exporter
+    # hands us the path of the downloaded file.
+    with open(path, 'rb') as f:
+        return upload_image(f.read())
 
 
 def main():
+    configure_logging(logging.DEBUG, '/tmp/rscraper.log')
     if log.level == logging.DEBUG:
         db.drop_all()
         db.create_all()
-    exporter = SQLAlchemyExporter(db, Recipe, Ingredient, upload_image)
+    exporter = SQLAlchemyExporter(db, Recipe, Ingredient, upload_spooled)
     crawlers = OrderedDict(sorted(get_crawlers().items())).values()
 
     scrape_and_export(exporter,